@@ -1,28 +1,39 @@
-import yaml
-import pygmo as pg
 import random
 import torch
 import numpy
 
+import ConfigRegistry
+import Evaluator
 import MORoverInterface
 import MOBeachInterface
 import Policy
 import Individual
+import Population
+import PopulationStore
+import SteadyState
 import Utils
 
 import ExpUtils.DataLogger
 
 class CentralisedAlgorithm:
-    def __init__(self, alg_config_filename, domain_name="rover", domain_config_filename=None, data_filename=None):
+    def __init__(self, alg_config_filename, domain_name="rover", domain_config_filename=None, data_filename=None, evaluator=None, num_workers=None):
         self.config_filename = alg_config_filename
         self._read_config()
+        # Evaluator settings given here (e.g. from the command line) take precedence over the config file
+        if evaluator is not None:
+            self.evaluator_name = evaluator
+        if num_workers is not None:
+            self.num_workers = num_workers
 
         self.data_filename = data_filename
-        self.data_logger = ExpUtils.DataLogger.DataLogger(data_fields=['gen',
-                                                                       'id',
-                                                                       'fitness',
-                                                                       'trajectory'],
-                                                                       target_filename=self.data_filename)
+        self.data_logger = ExpUtils.DataLogger.make_data_logger(self.log_format,
+                                                                data_fields=['gen',
+                                                                             'id',
+                                                                             'fitness',
+                                                                             'trajectory'],
+                                                                target_filename=self.data_filename,
+                                                                flush_size=self.log_flush_size,
+                                                                flush_interval=self.log_flush_interval)
 
         if domain_name == "rover":
             self.interface = MORoverInterface.MORoverInterface(domain_config_filename)
@@ -32,13 +43,14 @@ class CentralisedAlgorithm:
         self.team_size = self.interface.get_team_size()
         self.num_objs = self.interface.get_num_objs()
 
-        self.pop = []
+        # Fitness and metadata of the individuals in array columns, with a spare row for the offspring overshoot
+        self.pop = Population.Population(num_objs=self.num_objs, num_agents=self.team_size, capacity=self.pop_size + 1)
         self.glob_ind_counter = 0
         
         # Create the initial population
         for i in range(self.pop_size):
             # Add new individual ot the population
-            self.pop.append(Individual.Individual(config_filename=self.config_filename,
+            self.pop.add(Individual.Individual(config_filename=self.config_filename,
                                                   num_agents=self.team_size,
                                                   input_size=self.interface.get_state_size(),
                                                   output_size=self.interface.get_action_size(),
@@ -49,12 +61,25 @@ class CentralisedAlgorithm:
         
         # Evo utils
         self.utils = Utils.Utils(num_objs=self.num_objs)
+
+        # Runs the rollouts, in this process or on a pool of worker processes
+        self.evaluator = Evaluator.make_evaluator(self.evaluator_name, self.interface, domain_name, domain_config_filename, self.config_filename,
+                                                  batched_rollouts=self.batched_rollouts, num_workers=self.num_workers)
+
+        # Optionally move every policy into one contiguous parameter store, one row per individual
+        # NOTE: One spare row, as the offspring loop can overshoot the population size by one individual
+        self.store = None
+        if self.population_store:
+            self.store = PopulationStore.PopulationStore(capacity=self.pop_size + 1, num_agents=self.team_size, template_policy=self.pop[0].joint_policy[0],
+                                                      shared=isinstance(self.evaluator, Evaluator.ProcessPoolEvaluator))
+            for row, ind in enumerate(self.pop):
+                self.store.bind_joint_policy(row, ind.joint_policy)
+            self.evaluator.attach_store(self.store)
         
     def _read_config(self):
         """Read and load NSGA-II configuration from the YAML file."""
-        with open(self.config_filename, 'r') as config_file:
-            self.config_data = yaml.safe_load(config_file)
-            print('[NSGA-II]: YAML config read.')
+        self.config_data = ConfigRegistry.load_config(self.config_filename)
+        print('[NSGA-II]: YAML config read.')
 
         self._load_config()
     
@@ -62,18 +87,247 @@ class CentralisedAlgorithm:
         """Load internal NSGA-II configuration."""
         self.pop_size = self.config_data['Evolutionary']['pop_size']
         self.num_gens = self.config_data['Evolutionary']['num_gens']
+        # Lockstep rollouts give the same trajectories and fitnesses as one at a time (both use PolicyBatch), only faster
+        self.batched_rollouts = self.config_data['Evolutionary'].get('batched_rollouts', True)
+        self.cache_evaluations = self.config_data['Evolutionary'].get('cache_evaluations', True)
+        self.population_store = self.config_data['Evolutionary'].get('population_store', False)
+        self.evaluator_name = self.config_data['Evolutionary'].get('evaluator', 'serial')
+        self.num_workers = self.config_data['Evolutionary'].get('num_workers', None) # Defaults to the number of cores
+        # Log rows are buffered and appended in bulk: at each generation's end, every log_flush_size rows, or after log_flush_interval seconds
+        self.log_flush_size = self.config_data['Evolutionary'].get('log_flush_size', 1000)
+        self.log_flush_interval = self.config_data['Evolutionary'].get('log_flush_interval', 30.0)
+        # 'csv' rows, or 'npz' typed column chunks with a separate memory-mappable trajectory store (see ExpUtils.DataLogger)
+        self.log_format = self.config_data['Evolutionary'].get('log_format', 'csv')
+        # Replace the worst individual as soon as each evaluation finishes, instead of evolving generation by generation
+        self.steady_state = self.config_data['Evolutionary'].get('steady_state', False)
+        if self.steady_state and self.population_store:
+            raise ValueError("The population store holds a fixed number of rows, it cannot be used with steady_state.")
+
+    def rollout_joint_policies(self, joint_policies):
+        """
+        Roll out each joint policy with the configured evaluator, one episode at a time or all of them in lockstep.
+
+        Parameters:
+        - joint_policies (list): Joint policies (lists of Policy) to evaluate.
+
+        Returns:
+        - rollouts (list): (trajectory, fitness_dict) for each joint policy, in the same order.
+        """
+        return self.evaluator.evaluate(joint_policies)
+
+    def close(self):
+        """Release the evaluator's resources (e.g. its worker processes) and the shared memory of the population store, and write out the buffered log rows."""
+        self.evaluator.close()
+        if self.store is not None:
+            self.store.close()
+        self.data_logger.flush()
+
+    def create_offspring(self, parent_set, parent_jps1, parent_jps2):
+        """
+        Cross over and mutate pairs of (possibly compound) parent joint policies into new Individuals.
+
+        Parameters:
+        - parent_set (list): Individuals surviving into the next generation, whose policies must not be overwritten.
+        - parent_jps1 (list): First parent joint policy of each pair, each a list with one policy per agent.
+        - parent_jps2 (list): Second parent joint policy of each pair.
+
+        Returns:
+        - offspring_set (list): Two offspring Individuals per pair, with fresh ids.
+        """
+        if self.store is not None:
+            # One vectorised crossover and mutation over the whole offspring batch
+            offspring_jps = self.store.create_offspring(used_policies=[[ind.joint_policy[i] for ind in parent_set] for i in range(self.team_size)],
+                                                        parent_policies1=parent_jps1,
+                                                        parent_policies2=parent_jps2)
+            offspring_set = [Individual.Individual(joint_policy=jp, num_objs=self.num_objs, id=self.glob_ind_counter+1+i) for i, jp in enumerate(offspring_jps)]
+            self.glob_ind_counter += len(offspring_set)
+            return offspring_set
+
+        # The policies of the individuals that did not survive become buffers for the offspring
+        survivors = set(id(ind) for ind in parent_set)
+        for ind in self.pop:
+            if id(ind) not in survivors:
+                self.utils.recycle(ind.joint_policy)
+
+        offspring_set = []
+        for parent_jp1, parent_jp2 in zip(parent_jps1, parent_jps2):
+            # Get the offsprings by crossing over these (possibly compound) joint policies
+            offspring1, offspring2 = self.utils.crossover_joint_policies(parent_jp1, parent_jp2, self.glob_ind_counter)
+            # Mutate the offsprings by adding noise
+            offspring1.mutate()
+            offspring2.mutate()
+            # Add to the offspring set
+            offspring_set.extend([offspring1, offspring2])
+            # Update the global id counter
+            self.glob_ind_counter += 2
+        return offspring_set
+
+    def evaluate_population(self):
+        """
+        Roll out the individuals in the population that have no valid evaluation, and store their trajectory and fitness.
+        Rollouts are deterministic, so with cache_evaluations the parents carried over from the previous generation keep
+        their stored results (including counterfactual fitnesses) until they are mutated.
+        """
+        if self.cache_evaluations:
+            unevaluated = [ind for ind in self.pop if not ind.evaluated]
+        else:
+            unevaluated = self.pop
+            for ind in unevaluated:
+                ind.invalidate_evaluation()
+        if not unevaluated:
+            return
+
+        rollouts = self.rollout_joint_policies([ind.joint_policy for ind in unevaluated])
+        for ind, rollout in zip(unevaluated, rollouts):
+            self.assign_rollout(ind, rollout)
+
+    def assign_rollout(self, ind, rollout):
+        """Store the trajectory and (sign-flipped) fitness of a (trajectory, fitness_dict) rollout on its individual."""
+        trajectory, fitness_dict = rollout
+        if len(fitness_dict) != self.num_objs:
+            raise ValueError(f"[NSGA-II] Expected {self.num_objs} objectives, but got {len(fitness_dict)}.")
+        # Store the rollout trajectory
+        ind.trajectory = trajectory
+        # Store fitness
+        for f in fitness_dict:
+            ind.fitness[f] = -fitness_dict[f] # NOTE: The fitness sign is flipped to match Pygmo convention
+        ind.evaluated = True
+
+    def emigrants(self, num_migrants):
+        """
+        Copies of the best evaluated individuals, non-dominated ones first, to send to other islands.
+
+        Parameters:
+        - num_migrants (int): Maximum number of migrants.
+
+        Returns:
+        - migrants (list): Flattened joint policy (num_agents x num_params array) of each migrant, best first.
+        """
+        evaluated = [ind for ind in self.pop if ind.evaluated]
+        sorted_indices = self.pop.sort(evaluated)
+        return [Evaluator.flatten_joint_policy(evaluated[i].joint_policy) for i in sorted_indices[:num_migrants]]
+
+    def immigrate(self, migrants):
+        """
+        Take in individuals from other islands in place of offspring not evaluated yet, so the population size is
+        unchanged and the immigrants compete with this island's parents at the next generation.
+
+        Parameters:
+        - migrants (list): Flattened joint policies, as returned by emigrants. Any beyond the number of offspring are dropped.
+        """
+        offspring = [ind for ind in self.pop if not ind.evaluated]
+        for ind, migrant in zip(offspring, migrants):
+            Evaluator.load_joint_policy(ind.joint_policy, migrant)
+            ind.invalidate_evaluation()
+            self.glob_ind_counter += 1
+            ind.id = self.glob_ind_counter
+
+    def prepare_selection(self, parent_set):
+        """
+        Compute whatever select_parent_pair needs about a parent set, before pairs are picked from it.
+
+        Parameters:
+        - parent_set (list): Individuals to select from, sorted from best to worst.
+        """
+        pass
+
+    def select_parent_pair(self, parent_set):
+        """
+        Pick the two (possibly compound) parent joint policies of one offspring pair.
+
+        Parameters:
+        - parent_set (list): Individuals to select from, sorted from best to worst, after prepare_selection.
+
+        Returns:
+        - (parent_jp1, parent_jp2): Two joint policies, each a list with one policy per agent.
+        """
+        raise NotImplementedError
+
+    def evolve_steady_state(self, num_evals, traj_write_freq=100):
+        """
+        Asynchronous steady-state evolution: whenever an evaluation finishes, its individual is inserted into the
+        population (updating the non-dominated fronts incrementally), the worst individual is dropped, and new offspring
+        are sent to the freed worker. Every worker stays busy, at the cost of generation semantics.
+
+        Rows are logged as evaluations finish, with gen set to the number of evaluations finished before it divided by
+        pop_size, so each gen of the log covers pop_size consecutive evaluations.
+
+        Parameters:
+        - num_evals (int): Number of evaluations to run, including the initial population.
+        - traj_write_freq (int): Trajectories are logged for every traj_write_freq-th gen, and the last one.
+        """
+        fronts = SteadyState.ParetoFronts()
+        waiting = list(self.pop) # Initial individuals not submitted yet
+        pending = {} # Individuals being evaluated, by ticket
+        offspring = [] # Offspring created but not submitted yet, they come in pairs
+        self.pop.set_members([])
+        num_submitted, num_finished = 0, 0
+        last_gen = (num_evals - 1) // self.pop_size
+        while num_finished < num_evals:
+            # Keep every worker busy
+            while len(pending) < self.evaluator.num_workers and num_submitted < num_evals:
+                if waiting:
+                    ind = waiting.pop(0)
+                elif offspring:
+                    ind = offspring.pop(0)
+                elif len(self.pop) >= 2:
+                    # Offspring of the current population, all of which survives into the next step
+                    parent_set = fronts.sorted_individuals()
+                    self.prepare_selection(parent_set)
+                    parent_jp1, parent_jp2 = self.select_parent_pair(parent_set)
+                    offspring = self.create_offspring(parent_set, [parent_jp1], [parent_jp2])
+                    ind = offspring.pop(0)
+                else:
+                    break # Nothing to select parents from until more of the initial population is evaluated
+                pending[self.evaluator.submit(ind.joint_policy)] = ind
+                num_submitted += 1
+
+            ticket, rollout = self.evaluator.next_completed()
+            ind = pending.pop(ticket)
+            self.assign_rollout(ind, rollout)
+
+            # Add this individual's data to the logger
+            gen = num_finished // self.pop_size
+            if num_finished % self.pop_size == 0:
+                self.data_logger.end_generation() # Generation boundary
+            self.data_logger.add_data(key='gen', value=gen)
+            self.data_logger.add_data(key='id', value=ind.id)
+            self.data_logger.add_data(key='fitness', value=ind.fitness.tolist())
+            if gen == last_gen or gen % traj_write_freq == 0:
+                self.data_logger.add_data(key='trajectory', value=ind.trajectory)
+            else:
+                self.data_logger.add_data(key='trajectory', value=None)
+            self.data_logger.write_data()
+            num_finished += 1
+
+            # Insert it, and drop the worst individual once the population is full
+            fronts.insert(ind)
+            self.pop.add(ind)
+            if len(self.pop) > self.pop_size:
+                worst = fronts.remove_worst()
+                self.pop.remove(worst)
+                # Its policies become buffers for later offspring
+                self.utils.recycle(worst.joint_policy)
 
 class CoevolutionaryAlgorithm:
-    def __init__(self, alg_config_filename, domain_name="rover", domain_config_filename=None, data_filename=None):
+    def __init__(self, alg_config_filename, domain_name="rover", domain_config_filename=None, data_filename=None, evaluator=None, num_workers=None):
         self.config_filename = alg_config_filename
         self._read_config()
+        # Evaluator settings given here (e.g. from the command line) take precedence over the config file
+        if evaluator is not None:
+            self.evaluator_name = evaluator
+        if num_workers is not None:
+            self.num_workers = num_workers
 
         self.data_filename = data_filename
-        self.data_logger = ExpUtils.DataLogger.DataLogger(data_fields=['gen',
-                                                                       'id',
-                                                                       'fitness',
-                                                                       'trajectory'],
-                                                                       target_filename=self.data_filename)
+        self.data_logger = ExpUtils.DataLogger.make_data_logger(self.log_format,
+                                                                data_fields=['gen',
+                                                                             'id',
+                                                                             'fitness',
+                                                                             'trajectory'],
+                                                                target_filename=self.data_filename,
+                                                                flush_size=self.log_flush_size,
+                                                                flush_interval=self.log_flush_interval)
 
         if domain_name == "rover":
             self.interface = MORoverInterface.MORoverInterface(domain_config_filename)
@@ -96,16 +350,131 @@ class CoevolutionaryAlgorithm:
         
         # Evo utils
         self.utils = Utils.Utils(num_objs=self.num_objs)
+
+        # Runs the team rollouts and their counterfactual evaluations, in this process or on a pool of worker processes
+        self.evaluator = Evaluator.make_evaluator(self.evaluator_name, self.interface, domain_name, domain_config_filename, self.config_filename,
+                                                  batched_rollouts=self.batched_rollouts, num_workers=self.num_workers)
+
+        # Optionally move every policy into one contiguous parameter store, subpopulation i in column i
+        # NOTE: One spare row, as the offspring loop can overshoot the subpopulation size by one policy
+        self.store = None
+        if self.population_store:
+            self.store = PopulationStore.PopulationStore(capacity=self.pop_size + 1, num_agents=self.team_size, template_policy=self.pop[0][0],
+                                                      shared=isinstance(self.evaluator, Evaluator.ProcessPoolEvaluator))
+            for subpop_idx, subpop in enumerate(self.pop):
+                for row, policy in enumerate(subpop):
+                    self.store.bind(row, subpop_idx, policy)
+            self.evaluator.attach_store(self.store)
         
     def _read_config(self):
         """Read and load NSGA-II configuration from the YAML file."""
-        with open(self.config_filename, 'r') as config_file:
-            self.config_data = yaml.safe_load(config_file)
-            print('[NSGA-II+D]: YAML config read.')
+        self.config_data = ConfigRegistry.load_config(self.config_filename)
+        print('[NSGA-II+D]: YAML config read.')
 
         self._load_config()
     
     def _load_config(self):
         """Load internal NSGA-II configuration."""
         self.pop_size = self.config_data['Evolutionary']['pop_size']
-        self.num_gens = self.config_data['Evolutionary']['num_gens']
\ No newline at end of file
+        self.num_gens = self.config_data['Evolutionary']['num_gens']
+        # Lockstep rollouts give the same trajectories and fitnesses as one at a time (both use PolicyBatch), only faster
+        self.batched_rollouts = self.config_data['Evolutionary'].get('batched_rollouts', True)
+        self.population_store = self.config_data['Evolutionary'].get('population_store', False)
+        self.evaluator_name = self.config_data['Evolutionary'].get('evaluator', 'serial')
+        self.num_workers = self.config_data['Evolutionary'].get('num_workers', None) # Defaults to the number of cores
+        # Log rows are buffered and appended in bulk: at each generation's end, every log_flush_size rows, or after log_flush_interval seconds
+        self.log_flush_size = self.config_data['Evolutionary'].get('log_flush_size', 1000)
+        self.log_flush_interval = self.config_data['Evolutionary'].get('log_flush_interval', 30.0)
+        # 'csv' rows, or 'npz' typed column chunks with a separate memory-mappable trajectory store (see ExpUtils.DataLogger)
+        self.log_format = self.config_data['Evolutionary'].get('log_format', 'csv')
+
+    def rollout_joint_policies(self, joint_policies, counterfactuals=False):
+        """
+        Roll out each joint policy with the configured evaluator, one episode at a time or all of them in lockstep.
+
+        Parameters:
+        - joint_policies (list): Joint policies (lists of Policy) to evaluate.
+        - counterfactuals (bool): Also evaluate each trajectory with every agent left out in turn.
+
+        Returns:
+        - rollouts (list): (trajectory, fitness_dict) for each joint policy, in the same order.
+          With counterfactuals, (trajectory, fitness_dict, cf_fitness_dicts).
+        """
+        return self.evaluator.evaluate(joint_policies, counterfactuals=counterfactuals)
+
+    def close(self):
+        """Release the evaluator's resources (e.g. its worker processes) and the shared memory of the population store, and write out the buffered log rows."""
+        self.evaluator.close()
+        if self.store is not None:
+            self.store.close()
+        self.data_logger.flush()
+
+    def emigrants(self, num_migrants):
+        """
+        Teams of the best policies to send to other islands: the k-th migrant has the k-th best policy of each subpopulation.
+        Only meaningful right after evolve, when each subpopulation starts with its sorted survivors.
+
+        Parameters:
+        - num_migrants (int): Maximum number of migrants.
+
+        Returns:
+        - migrants (list): Flattened joint policy (num_agents x num_params array) of each migrant team, best first.
+        """
+        return [Evaluator.flatten_joint_policy([subpop[k] for subpop in self.pop]) for k in range(min(num_migrants, self.pop_size // 2))]
+
+    def immigrate(self, migrants):
+        """
+        Take in teams from other islands in place of the newest offspring of each subpopulation.
+
+        Parameters:
+        - migrants (list): Flattened joint policies, as returned by emigrants. Any beyond the number of offspring are dropped.
+        """
+        for k, migrant in enumerate(migrants[:self.pop_size - self.pop_size // 2]):
+            Evaluator.load_joint_policy([subpop[-1 - k] for subpop in self.pop], migrant)
+
+    def create_offspring(self, parent_pairs):
+        """
+        Cross over and mutate parent policy pairs within each subpopulation.
+
+        Parameters:
+        - parent_pairs (list): For each subpopulation, a list of (parent1, parent2) Policy pairs. Every subpopulation has the same number of pairs.
+
+        Returns:
+        - offspring (list): For each subpopulation, the list of offspring policies, two per pair.
+        """
+        if self.store is not None:
+            # One vectorised crossover and mutation over every subpopulation, subpopulation i is column i of the store
+            offspring_jps = self.store.create_offspring(used_policies=self.pop,
+                                                        parent_policies1=[[pairs[k][0] for pairs in parent_pairs] for k in range(len(parent_pairs[0]))],
+                                                        parent_policies2=[[pairs[k][1] for pairs in parent_pairs] for k in range(len(parent_pairs[0]))])
+            return [[jp[subpop_idx] for jp in offspring_jps] for subpop_idx in range(len(parent_pairs))]
+
+        if isinstance(self.evaluator, Evaluator.ProcessPoolEvaluator) and parent_pairs[0]:
+            # Subpopulations are varied independently, so each one is crossed over and mutated in one batch on a worker
+            # NOTE: Seeds are drawn from the global generator, so runs stay reproducible whatever the number of workers
+            seeds = torch.randint(2**62, (len(parent_pairs),)).tolist()
+            template = parent_pairs[0][0][0]
+            tasks = [(Evaluator.flatten_joint_policy([parent1 for parent1, _ in subpop_pairs]),
+                      Evaluator.flatten_joint_policy([parent2 for _, parent2 in subpop_pairs]),
+                      template.mutation_rate, template.mutation_scale, seed) for subpop_pairs, seed in zip(parent_pairs, seeds)]
+            offspring = []
+            for flat_offspring in self.evaluator.create_offspring(tasks):
+                offspring_set = [self.utils.offspring_buffer(template) for _ in range(len(flat_offspring))]
+                with torch.no_grad():
+                    for policy, flat_policy in zip(offspring_set, flat_offspring):
+                        torch.nn.utils.vector_to_parameters(torch.from_numpy(flat_policy), policy.parameters())
+                offspring.append(offspring_set)
+            return offspring
+
+        offspring = []
+        for subpop_pairs in parent_pairs:
+            offspring_set = []
+            for parent1, parent2 in subpop_pairs:
+                # Crossover the parent policies using SBX to get two offspring
+                offspring1, offspring2 = self.utils.SBX(parent1, parent2)
+                # Mutate the offsprings by adding noise
+                offspring1.mutate()
+                offspring2.mutate()
+                offspring_set.extend([offspring1, offspring2])
+            offspring.append(offspring_set)
+        return offspring
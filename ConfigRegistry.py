@@ -0,0 +1,58 @@
+import os
+import yaml
+
+# Parsed configs by absolute file path, shared by everything in the process
+_configs = {}
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} is read-only, configs are shared by every user of the file.")
+
+class FrozenDict(dict):
+    """Read-only dict for a parsed config section. Still a dict, so existing isinstance checks and dict methods keep working."""
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __ior__ = _read_only
+
+    def __copy__(self):
+        return self # Immutable, so a copy can be the same object
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+class FrozenList(list):
+    """Read-only list for a parsed config value. Still a list, so concatenation and isinstance checks keep working."""
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (type(self), (list(self),))
+
+def freeze(value):
+    """Recursively turn parsed YAML (dicts, lists and scalars) into FrozenDict, FrozenList and scalars."""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+def load_config(config_filename):
+    """
+    Parsed contents of a YAML config file, read from disk only the first time the file is asked for in this process.
+
+    Parameters:
+    - config_filename (str): Path to the YAML config file.
+
+    Returns:
+    - config (FrozenDict): Read-only parsed config, shared by every caller asking for the same file.
+    """
+    key = os.path.realpath(config_filename)
+    if key not in _configs:
+        with open(config_filename, 'r') as config_file:
+            _configs[key] = freeze(yaml.safe_load(config_file))
+    return _configs[key]
@@ -0,0 +1,315 @@
+import os
+import queue
+import itertools
+import collections
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import torch
+
+import MORoverInterface
+import MOBeachInterface
+from Policy import Policy
+from Utils import Utils
+
+INTERFACES = {'rover': MORoverInterface.MORoverInterface,
+              'beach': MOBeachInterface.MOBeachInterface}
+EVALUATORS = ('serial', 'process_pool')
+
+def make_interface(domain_name, domain_config_filename):
+    """Domain interface for a domain name ('rover' or 'beach')."""
+    if domain_name not in INTERFACES:
+        raise ValueError(f"Unknown domain '{domain_name}', expected one of {tuple(INTERFACES)}.")
+    return INTERFACES[domain_name](domain_config_filename)
+
+def flatten_joint_policy(joint_policy):
+    """
+    Parameters of a joint policy as one array, the compact form joint policies are shipped to worker processes in.
+
+    Returns:
+    - np.ndarray: num_agents x num_params float32 array, row i holds the parameters of policy i in parameters() order.
+    """
+    with torch.no_grad():
+        return torch.stack([torch.nn.utils.parameters_to_vector(policy.parameters()) for policy in joint_policy]).numpy()
+
+def load_joint_policy(joint_policy, flat_joint_policy):
+    """
+    Copy parameters in the form of flatten_joint_policy into the policies of a joint policy, in place, so that
+    policies bound to a population store stay bound to it.
+
+    Parameters:
+    - joint_policy (list): Policies to overwrite, one per agent.
+    - flat_joint_policy (np.ndarray): num_agents x num_params float32 array.
+    """
+    with torch.no_grad():
+        for policy, flat_policy in zip(joint_policy, flat_joint_policy):
+            offset = 0
+            for param in policy.parameters():
+                param.copy_(torch.from_numpy(flat_policy[offset:offset + param.numel()]).view_as(param))
+                offset += param.numel()
+
+class SerialEvaluator:
+    def __init__(self, interface, batched_rollouts=True):
+        """
+        Rolls out joint policies in the calling process.
+
+        Parameters:
+        - interface: Domain interface (MORoverInterface or MOBeachInterface) to roll out in.
+        - batched_rollouts (bool): Roll out all joint policies in lockstep (interface.rollout_batch) instead of one at a time.
+        """
+        self.interface = interface
+        self.batched_rollouts = batched_rollouts
+        self.num_workers = 1
+        self.tickets = itertools.count()
+        self.completed = collections.deque()
+
+    def evaluate(self, joint_policies, counterfactuals=False):
+        """
+        Roll out each joint policy.
+
+        Parameters:
+        - joint_policies (list): Joint policies (lists of Policy) to evaluate.
+        - counterfactuals (bool): Also evaluate each trajectory with every agent left out in turn.
+
+        Returns:
+        - rollouts (list): (trajectory, fitness_dict) for each joint policy, in the same order. With counterfactuals,
+          (trajectory, fitness_dict, cf_fitness_dicts) where cf_fitness_dicts is interface.evaluate_counterfactuals(trajectory).
+        """
+        if self.batched_rollouts:
+            rollouts = self.interface.rollout_batch(joint_policies)
+        else:
+            rollouts = [self.interface.rollout(joint_policy) for joint_policy in joint_policies]
+        if counterfactuals:
+            return [(trajectory, fitness_dict, self.interface.evaluate_counterfactuals(trajectory)) for trajectory, fitness_dict in rollouts]
+        return rollouts
+
+    def submit(self, joint_policy, counterfactuals=False):
+        """
+        Start the evaluation of a single joint policy. Here it runs to completion straight away.
+
+        Parameters:
+        - joint_policy (list): Joint policy (list of Policy) to evaluate.
+        - counterfactuals (bool): Also evaluate the trajectory with every agent left out in turn.
+
+        Returns:
+        - ticket (int): Identifies the evaluation in next_completed.
+        """
+        ticket = next(self.tickets)
+        self.completed.append((ticket, self.evaluate([joint_policy], counterfactuals=counterfactuals)[0]))
+        return ticket
+
+    def next_completed(self):
+        """
+        Wait for a submitted evaluation to finish.
+
+        Returns:
+        - (ticket, rollout): The submit ticket and the rollout, as an element of evaluate's result.
+        """
+        return self.completed.popleft()
+
+    def attach_store(self, store):
+        """Nothing to do, rollouts in this process use the store's policies directly."""
+        pass
+
+    def close(self):
+        pass
+
+# State of a pool worker process, set up once by _init_worker
+_worker_evaluator = None
+_worker_policy_args = None
+_worker_joint_policies = [] # Policies the shipped parameters are loaded into, reused across tasks
+_worker_shared_blocks = {} # Parameter arrays of the shared population stores attached to so far, by block name
+
+def _shared_parameters(name, shape):
+    """Parameter array of a shared population store, attached to on first use."""
+    if name not in _worker_shared_blocks:
+        block = shared_memory.SharedMemory(name=name)
+        _worker_shared_blocks[name] = (block, np.ndarray(shape, dtype=np.float32, buffer=block.buf))
+    return _worker_shared_blocks[name][1]
+
+def _init_worker(domain_name, domain_config_filename, alg_config_filename, input_size, output_size, num_agents, batched_rollouts):
+    global _worker_evaluator, _worker_policy_args
+    # NOTE: The pool already uses every core, intra-op threads in each worker would only oversubscribe them
+    torch.set_num_threads(1)
+    _worker_evaluator = SerialEvaluator(make_interface(domain_name, domain_config_filename), batched_rollouts=batched_rollouts)
+    _worker_policy_args = (alg_config_filename, input_size, output_size, num_agents)
+
+def _evaluate_chunk(task):
+    shared_block, joint_policy_data, counterfactuals = task
+    if shared_block is None:
+        flat_joint_policies = joint_policy_data
+    else:
+        # Store rows of each agent's policy, read straight from the shared parameter array
+        params = _shared_parameters(*shared_block)
+        flat_joint_policies = [params[rows, np.arange(len(rows))] for rows in joint_policy_data]
+    alg_config_filename, input_size, output_size, num_agents = _worker_policy_args
+    while len(_worker_joint_policies) < len(flat_joint_policies):
+        _worker_joint_policies.append([Policy(alg_config_filename, input_size=input_size, output_size=output_size, init_parameters=False) for _ in range(num_agents)])
+    joint_policies = _worker_joint_policies[:len(flat_joint_policies)]
+    with torch.no_grad():
+        for joint_policy, flat_joint_policy in zip(joint_policies, flat_joint_policies):
+            for policy, flat_policy in zip(joint_policy, flat_joint_policy):
+                torch.nn.utils.vector_to_parameters(torch.from_numpy(flat_policy), policy.parameters())
+    return _worker_evaluator.evaluate(joint_policies, counterfactuals=counterfactuals)
+
+def _create_offspring_task(task):
+    parents1, parents2, mutation_rate, mutation_scale, seed = task
+    # Each task draws from its own seeded generator, so the offspring do not depend on which worker runs it
+    generator = torch.Generator().manual_seed(seed)
+    utils = Utils()
+    with torch.no_grad():
+        child1, child2 = utils.SBX_batch(torch.from_numpy(parents1), torch.from_numpy(parents2), generator=generator)
+        # Pair k gives offspring 2k and 2k+1
+        offspring = torch.stack((child1, child2), dim=1).reshape(2 * len(parents1), -1)
+        return utils.mutate_batch(offspring, mutation_rate, mutation_scale, generator=generator).numpy()
+
+class ProcessPoolEvaluator:
+    def __init__(self, domain_name, domain_config_filename, alg_config_filename, input_size, output_size, num_agents,
+                 batched_rollouts=True, num_workers=None):
+        """
+        Rolls out joint policies on a persistent pool of worker processes, each with its own domain interface.
+
+        Parameters:
+        - domain_name (str): 'rover' or 'beach'.
+        - domain_config_filename (str): Domain config file the workers build their interface from.
+        - alg_config_filename (str): Algorithm config file with the Policy settings.
+        - input_size (int): Number of inputs of each policy.
+        - output_size (int): Number of outputs of each policy.
+        - num_agents (int): Number of policies per joint policy (team size).
+        - batched_rollouts (bool): Each worker rolls out its share of joint policies in lockstep.
+        - num_workers (int, optional): Number of worker processes. Defaults to the number of cores.
+        """
+        self.num_workers = num_workers if num_workers is not None else os.cpu_count()
+        if self.num_workers < 1:
+            raise ValueError(f"The process pool evaluator needs at least one worker, got {self.num_workers}.")
+        self.batched_rollouts = batched_rollouts
+        self.store = None
+        self.tickets = itertools.count()
+        self.completed = queue.Queue() # (ticket, rollout or exception) of finished submit() evaluations
+        # NOTE: Started before the workers so that they share it. A worker with its own tracker would unlink the
+        # shared parameter blocks it attached to when it exits
+        resource_tracker.ensure_running()
+        self.pool = multiprocessing.Pool(processes=self.num_workers,
+                                         initializer=_init_worker,
+                                         initargs=(domain_name, domain_config_filename, alg_config_filename,
+                                                   input_size, output_size, num_agents, batched_rollouts))
+
+    def evaluate(self, joint_policies, counterfactuals=False):
+        """
+        Roll out each joint policy on the worker pool.
+
+        Parameters:
+        - joint_policies (list): Joint policies (lists of Policy) to evaluate.
+        - counterfactuals (bool): Also evaluate each trajectory with every agent left out in turn, in the same worker.
+
+        Returns:
+        - rollouts (list): Same as SerialEvaluator.evaluate, in the same order as in serial evaluation.
+        """
+        if not joint_policies:
+            return []
+        shared_block, joint_policy_data = self._task_data(joint_policies)
+        # One contiguous chunk per worker when rolling out in lockstep, otherwise a few per worker to balance the load
+        num_chunks = self.num_workers if self.batched_rollouts else 4 * self.num_workers
+        chunks = [chunk for chunk in np.array_split(np.arange(len(joint_policy_data)), num_chunks) if len(chunk)]
+        # NOTE: map returns the results in task order, so the rollouts line up with joint_policies
+        results = self.pool.map(_evaluate_chunk, [(shared_block, [joint_policy_data[i] for i in chunk], counterfactuals) for chunk in chunks])
+        return [rollout for chunk_results in results for rollout in chunk_results]
+
+    def submit(self, joint_policy, counterfactuals=False):
+        """
+        Start the evaluation of a single joint policy on the next free worker, without waiting for it.
+
+        Parameters:
+        - joint_policy (list): Joint policy (list of Policy) to evaluate.
+        - counterfactuals (bool): Also evaluate the trajectory with every agent left out in turn.
+
+        Returns:
+        - ticket (int): Identifies the evaluation in next_completed.
+        """
+        ticket = next(self.tickets)
+        shared_block, joint_policy_data = self._task_data([joint_policy])
+        self.pool.apply_async(_evaluate_chunk, ((shared_block, joint_policy_data, counterfactuals),),
+                              callback=lambda rollouts: self.completed.put((ticket, rollouts[0])),
+                              error_callback=lambda error: self.completed.put((ticket, error)))
+        return ticket
+
+    def next_completed(self):
+        """
+        Wait for the next submitted evaluation to finish, in completion order rather than submission order.
+
+        Returns:
+        - (ticket, rollout): The submit ticket and the rollout, as an element of evaluate's result.
+        """
+        ticket, rollout = self.completed.get()
+        if isinstance(rollout, BaseException):
+            raise rollout
+        return ticket, rollout
+
+    def _task_data(self, joint_policies):
+        """Shared block (or None) and what is shipped to the workers for each joint policy."""
+        if self.store is not None and all(self._in_store(joint_policy) for joint_policy in joint_policies):
+            # The workers read the parameters from the shared store, so only the store rows are shipped
+            return self.store.shared_block(), [np.array([policy.store_row for policy in joint_policy]) for joint_policy in joint_policies]
+        # Only the parameters are shipped, the workers already have everything else
+        return None, [flatten_joint_policy(joint_policy) for joint_policy in joint_policies]
+
+    def attach_store(self, store):
+        """
+        Evaluate joint policies bound to a population store allocated in shared memory by their rows in the store.
+        The workers then read the parameters in place, and the only parameter writes between generations are the
+        store's own writes of offspring into their rows.
+
+        Parameters:
+        - store (PopulationStore): Store created with shared=True, with agent i of each joint policy in column i.
+        """
+        store.shared_block() # Fails early for a store that is not shared
+        self.store = store
+
+    def _in_store(self, joint_policy):
+        """Whether agent i's policy of the joint policy is the one bound to column i of the attached store."""
+        return all(getattr(policy, 'store_row', None) is not None and self.store.policies[policy.store_row][agent] is policy
+                   for agent, policy in enumerate(joint_policy))
+
+    def create_offspring(self, tasks):
+        """
+        Cross over and mutate several independent groups of parent pairs (e.g. one per subpopulation) on the worker pool.
+
+        Parameters:
+        - tasks (list): (parents1, parents2, mutation_rate, mutation_scale, seed) per group, where parents1 and parents2 are
+          num_pairs x num_params float32 arrays of flattened parent policies and seed seeds the group's random numbers.
+
+        Returns:
+        - offspring (list): 2 * num_pairs x num_params float32 array of flattened offspring policies per group, in task order.
+        """
+        return self.pool.map(_create_offspring_task, tasks)
+
+    def close(self):
+        """Shut down the worker processes."""
+        self.pool.close()
+        self.pool.join()
+
+def make_evaluator(evaluator, interface, domain_name, domain_config_filename, alg_config_filename, batched_rollouts=True, num_workers=None):
+    """
+    Evaluator selected by name.
+
+    Parameters:
+    - evaluator (str): 'serial' or 'process_pool'.
+    - interface: The algorithm's own domain interface, used by the serial evaluator.
+    - domain_name (str), domain_config_filename (str), alg_config_filename (str): Let pool workers build their own interface and policies.
+    - batched_rollouts (bool): Roll out joint policies in lockstep.
+    - num_workers (int, optional): Number of pool workers. Defaults to the number of cores.
+
+    Returns:
+    - SerialEvaluator or ProcessPoolEvaluator.
+    """
+    if evaluator == 'serial':
+        return SerialEvaluator(interface, batched_rollouts=batched_rollouts)
+    if evaluator == 'process_pool':
+        return ProcessPoolEvaluator(domain_name, domain_config_filename, alg_config_filename,
+                                    input_size=interface.get_state_size(),
+                                    output_size=interface.get_action_size(),
+                                    num_agents=interface.get_team_size(),
+                                    batched_rollouts=batched_rollouts,
+                                    num_workers=num_workers)
+    raise ValueError(f"Unknown evaluator '{evaluator}', expected one of {EVALUATORS}.")
@@ -1,11 +1,21 @@
+import os
 import csv
 import copy
+import glob
+import time
+import atexit
+
+import numpy as np
+
+LOG_FORMATS = ('csv', 'npz')
 
 class DataLogger:
-    def __init__(self, data_fields: list, target_filename=None):
+    def __init__(self, data_fields: list, target_filename=None, flush_size=1000, flush_interval=30.0):
         '''
         data_fields (list): the order in which the fields appear here is the order in which they
         will be saved in the destination file.
+        flush_size (int): rows are buffered in memory and appended to the file once this many are waiting.
+        flush_interval (float): seconds after which waiting rows are appended anyway, at the next write.
         '''
         self.target_filename = target_filename
         # Save the data fields
@@ -14,11 +24,26 @@ class DataLogger:
         self.data = {}
         for data_field in self.data_fields:
             self.data[data_field] = None
+        # Rows waiting to be written, each a list of values in data_fields order
+        self.buffer = []
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        self._create_target()
+        # NOTE: Processes ended with os._exit (e.g. multiprocessing children) skip this, their owners must call flush
+        atexit.register(self.flush)
+
+    def _create_target(self):
+        '''
+        Create the (empty) log.
+        '''
+        # NOTE: Readers take a columnar log of the same name for this file, so an earlier one must not outlive it
+        remove_columnar_log(columnar_log_dir(self.target_filename))
         # Open and clear the file
         with open(self.target_filename, 'w', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=self.data_fields)
-            writer.writeheader()
-    
+            writer = csv.writer(csvfile)
+            writer.writerow(self.data_fields)
+
     def add_data(self, key=None, value=None):
         '''
         Add data to be saved for this generation.
@@ -26,12 +51,133 @@ class DataLogger:
         '''
         if key in self.data:
             self.data[key] = value
-    
+
     def write_data(self):
         '''
-        Will write the saved data into the file.
+        Will save the data added since the last write as a row of the file.
+        '''
+        self.write_rows([self.data])
+
+    def write_rows(self, rows):
+        '''
+        Save several rows at once. Each row is a dict from data field to value, missing fields are left empty
+        and keys that are not data fields are ignored.
+        '''
+        self.buffer.extend([row.get(data_field) for data_field in self.data_fields] for row in rows)
+        if len(self.buffer) >= self.flush_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def end_generation(self):
+        '''
+        Mark the end of a generation's rows: the CSV log writes them out, so the file is complete up to here.
+        '''
+        self.flush()
+
+    def flush(self):
+        '''
+        Append the buffered rows to the file, with a single open.
         '''
-        if self.target_filename:
+        if self.buffer and self.target_filename:
             with open(self.target_filename, 'a', newline='') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=self.data_fields)
-                writer.writerow(self.data)
+                writer = csv.writer(csvfile)
+                writer.writerows(self.buffer)
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+def columnar_log_dir(target_filename):
+    '''
+    Directory of the columnar log for a save data filename: the filename without its .csv extension.
+    '''
+    return target_filename[:-len('.csv')] if target_filename.endswith('.csv') else target_filename
+
+def remove_columnar_log(log_dir):
+    '''
+    Delete the chunks of the columnar log in log_dir, and the directory itself once it is empty.
+    '''
+    if not os.path.isdir(log_dir):
+        return
+    for filename in glob.glob(os.path.join(log_dir, 'columns_*.npz')) + glob.glob(os.path.join(log_dir, 'trajectories_*.npy')):
+        os.remove(filename)
+    if not os.listdir(log_dir):
+        os.rmdir(log_dir)
+
+def trajectory_arrays(trajectory):
+    '''
+    Per-field arrays of a trajectory, each num_agents x ep_length (x field shape): from the per-agent lists of
+    transition dicts that the interfaces return, or from a compact (dict of arrays) beach trajectory.
+    '''
+    if isinstance(trajectory, dict):
+        # Compact form: ep_length x num_agents arrays, and the per-agent types
+        num_steps = len(trajectory['position'])
+        return {field: (np.broadcast_to(np.asarray(values)[:, np.newaxis], (len(values), num_steps)) if np.ndim(values) == 1 else np.asarray(values).T)
+                for field, values in trajectory.items()}
+    return {field: np.array([[transition[field] for transition in agent_trajectory] for agent_trajectory in trajectory])
+            for field in trajectory[0][0]}
+
+class NpzDataLogger(DataLogger):
+    def __init__(self, data_fields: list, target_filename=None, flush_size=1000, flush_interval=30.0):
+        '''
+        Columnar alternative to the CSV log, with the same fields and buffering. Each flush writes one chunk to a
+        directory named after target_filename (without .csv):
+        - columns_<chunk>.npz: one typed array per field (e.g. gen, id, and fitness as rows x num_objs), where the
+          trajectory column is the row of each logged trajectory in the chunk's trajectory arrays, or -1.
+        - trajectories_<chunk>_<field>.npy: the chunk's trajectories, one array per transition field (e.g. position,
+          action), each num_trajectories x num_agents x ep_length (x field shape), to be memory-mapped.
+        ExpUtils.LogReader reads it back, including single trajectories by (gen, id).
+        '''
+        self.log_dir = columnar_log_dir(target_filename)
+        self.num_chunks = 0
+        super().__init__(data_fields, target_filename=target_filename, flush_size=flush_size, flush_interval=flush_interval)
+
+    def _create_target(self):
+        '''
+        Create the log directory, clearing the chunks of an earlier log there and any CSV log of the same name.
+        '''
+        # NOTE: Readers take an existing CSV file before the directory, so an earlier one would hide this log
+        if os.path.isfile(self.target_filename):
+            os.remove(self.target_filename)
+        remove_columnar_log(self.log_dir)
+        os.makedirs(self.log_dir, exist_ok=True)
+
+    def end_generation(self):
+        '''
+        Generations do not end chunks, which only hold flush_size rows or flush_interval seconds of them, so runs
+        with small populations do not leave one tiny chunk per generation.
+        '''
+        if len(self.buffer) >= self.flush_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        '''
+        Write the buffered rows as the next chunk.
+        '''
+        if self.buffer and self.target_filename:
+            chunk = self.num_chunks
+            columns = {}
+            for idx, data_field in enumerate(self.data_fields):
+                values = [row[idx] for row in self.buffer]
+                if data_field != 'trajectory':
+                    columns[data_field] = np.array(values)
+                    continue
+                is_logged = np.array([value is not None for value in values])
+                columns[data_field] = np.where(is_logged, np.cumsum(is_logged) - 1, -1)
+                logged = [value for value in values if value is not None]
+                if logged:
+                    arrays = [trajectory_arrays(trajectory) for trajectory in logged]
+                    for field in arrays[0]:
+                        np.save(os.path.join(self.log_dir, f'trajectories_{chunk:06d}_{field}.npy'), np.stack([array[field] for array in arrays]))
+            # NOTE: The columns file is written last, so a chunk is only visible to readers once it is complete
+            np.savez(os.path.join(self.log_dir, f'columns_{chunk:06d}.npz'), **columns)
+            self.num_chunks += 1
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+def make_data_logger(log_format, data_fields: list, target_filename=None, flush_size=1000, flush_interval=30.0):
+    '''
+    DataLogger for a log format: 'csv' (one text row per entry) or 'npz' (NpzDataLogger).
+    '''
+    if log_format == 'csv':
+        return DataLogger(data_fields, target_filename=target_filename, flush_size=flush_size, flush_interval=flush_interval)
+    if log_format == 'npz':
+        return NpzDataLogger(data_fields, target_filename=target_filename, flush_size=flush_size, flush_interval=flush_interval)
+    raise ValueError(f"Unknown log format '{log_format}', expected one of {LOG_FORMATS}.")
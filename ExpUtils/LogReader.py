@@ -0,0 +1,98 @@
+import os
+import re
+import csv
+import ast
+import sys
+import glob
+
+import numpy as np
+
+def _columnar_dir(path):
+    '''
+    Directory of the columnar (npz) log at path, which can be the directory itself or the save data filename
+    the run was given (ending in .csv) when no such file exists. None for a CSV log.
+    '''
+    if os.path.isfile(path):
+        return None
+    if os.path.isdir(path):
+        return path
+    if path.endswith('.csv') and os.path.isdir(path[:-len('.csv')]):
+        return path[:-len('.csv')]
+    return None
+
+def _chunk_numbers(log_dir):
+    # Chunks are complete once their columns file exists
+    return sorted(int(os.path.basename(filename)[len('columns_'):-len('.npz')]) for filename in glob.glob(os.path.join(log_dir, 'columns_*.npz')))
+
+def _literal(cell):
+    # NOTE: Older logs wrote NumPy scalars with their repr, e.g. np.float64(-1.0)
+    return ast.literal_eval(re.sub(r'np\.\w+\(([^()]*)\)', r'\1', cell))
+
+def read_columns(path, fields=('gen', 'id', 'fitness')):
+    '''
+    Read whole columns of a save data log, CSV or columnar.
+
+    Parameters:
+    - path (str): Save data filename (.csv) or columnar log directory.
+    - fields (tuple): Columns to read, except trajectory.
+
+    Returns:
+    - columns (dict): One array per field, a row per log entry (fitness is num_entries x num_objs).
+    '''
+    log_dir = _columnar_dir(path)
+    if log_dir is None:
+        csv.field_size_limit(sys.maxsize) # Trajectory cells are long
+        values = {field: [] for field in fields}
+        with open(path, newline='') as csvfile:
+            for row in csv.DictReader(csvfile):
+                for field in fields:
+                    values[field].append(_literal(row[field]))
+        return {field: np.array(column) for field, column in values.items()}
+
+    chunks = []
+    for chunk in _chunk_numbers(log_dir):
+        with np.load(os.path.join(log_dir, f'columns_{chunk:06d}.npz')) as columns:
+            chunks.append({field: columns[field] for field in fields})
+    if not chunks:
+        return {field: np.zeros(0) for field in fields}
+    return {field: np.concatenate([columns[field] for columns in chunks]) for field in fields}
+
+def fitness_by_generation(path):
+    '''
+    Fitnesses of a save data log, a generation at a time.
+
+    Parameters:
+    - path (str): Save data filename (.csv) or columnar log directory.
+
+    Returns:
+    - generations (list): (gen, num_entries x num_objs fitness array) for each gen, in increasing gen order.
+    '''
+    columns = read_columns(path, fields=('gen', 'fitness'))
+    order = np.argsort(columns['gen'], kind='stable')
+    gens, starts = np.unique(columns['gen'][order], return_index=True)
+    return list(zip(gens.tolist(), np.split(columns['fitness'][order], starts[1:])))
+
+def load_trajectory(path, gen, id, mmap_mode='r'):
+    '''
+    Logged trajectory of one entry of a columnar log, without reading the others.
+
+    Parameters:
+    - path (str): Save data filename (.csv) or columnar log directory.
+    - gen (int), id (int): Entry of the trajectory.
+    - mmap_mode (str, optional): Memory-map the trajectory arrays (the default), or None to load them.
+
+    Returns:
+    - trajectory (dict): One array per transition field (e.g. state, action, position), each num_agents x ep_length (x field shape).
+    '''
+    log_dir = _columnar_dir(path)
+    if log_dir is None:
+        raise ValueError(f"{path} is not a columnar log, its trajectories are in its trajectory column.")
+    for chunk in _chunk_numbers(log_dir):
+        with np.load(os.path.join(log_dir, f'columns_{chunk:06d}.npz')) as columns:
+            matches = np.flatnonzero((columns['gen'] == gen) & (columns['id'] == id) & (columns['trajectory'] >= 0))
+            if len(matches) == 0:
+                continue
+            row = int(columns['trajectory'][matches[0]])
+        prefix = os.path.join(log_dir, f'trajectories_{chunk:06d}_')
+        return {filename[len(prefix):-len('.npy')]: np.load(filename, mmap_mode=mmap_mode)[row] for filename in sorted(glob.glob(prefix + '*.npy'))}
+    raise ValueError(f"No trajectory was logged for gen {gen}, id {id} in {path}.")
@@ -1,12 +1,14 @@
-import pandas as pd
-import ast
 import numpy as np
 import matplotlib.pyplot as plt
 
 # Import HV from pymoo
 from pymoo.indicators.hv import HV
-# Import pygmo for finding the NDF
-import pygmo as pg
+# Import the repository's Ranking module for finding the NDF
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Ranking
+from ExpUtils import LogReader
 # For SEM (standard error of the mean)
 from scipy.stats import sem
 
@@ -56,19 +58,15 @@ hv_indicator = HV(ref_point=np.array([0, 0]))
 # ----------------------------
 def compute_hv_for_file(csv_file):
     """
-    Reads a CSV file, parses the 'fitness' column,
+    Reads the fitness column of a save data log (CSV, or the columnar npz log of the same name),
     computes the Non-dominated Front for each generation,
     and returns a dictionary: gen -> hypervolume.
     """
-    df = pd.read_csv(csv_file, usecols=["gen", "fitness"])
-    df["fitness_list"] = df["fitness"].apply(lambda x: ast.literal_eval(x))
-    
     hv_dict = {}
-    for g in sorted(df["gen"].unique()):
-        gen_data = df[df["gen"] == g]["fitness_list"].tolist()
+    # CSV logs are parsed, columnar (npz) logs are read as arrays
+    for g, gen_data in LogReader.fitness_by_generation(csv_file):
         # Compute non-dominated front
-        ndf, _, _, _ = pg.fast_non_dominated_sorting(points=gen_data)
-        ndf_fitnesses = np.array([gen_data[i] for i in ndf[0]])
+        ndf_fitnesses = gen_data[Ranking.non_dominated(gen_data)]
         # Remove duplicates
         F = np.unique(ndf_fitnesses, axis=0)
         hv_val = hv_indicator(F)
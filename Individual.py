@@ -1,41 +1,96 @@
-import yaml
+import numpy
 
 import Policy
 
+def _field(name, column):
+    """Property for a field that lives in the individual's Population row, or on the individual outside a population."""
+    slot = '_' + name
+
+    def get(self):
+        if self.population is None:
+            return getattr(self, slot)
+        value = getattr(self.population, column)[self.row]
+        return value.item() if isinstance(value, numpy.generic) else value # NOTE: Fitness stays a writable row view
+
+    def set(self, value):
+        if self.population is None:
+            setattr(self, slot, value)
+        else:
+            getattr(self.population, column)[self.row] = value
+
+    return property(get, set)
+
 class Individual:
+    __slots__ = ('joint_policy', 'num_objs', 'population', 'row', '_id', '_fitness', '_evaluated', '_trajectory', '_cf_fitnesses')
+
+    id = _field('id', 'ids')
+    fitness = _field('fitness', 'fitness') # Minimised, NumPy array of num_objs values
+    evaluated = _field('evaluated', 'evaluated')
+    trajectory = _field('trajectory', 'trajectories')
+    cf_fitnesses = _field('cf_fitnesses', 'cf_fitnesses') # Per-policy counterfactual fitnesses of the trajectory, filled in on first use
+
     def __init__(self,
                  joint_policy=None,
-                 config_filename=None, 
-                 num_agents=10, 
-                 input_size=10, 
-                 output_size=2, 
-                 id=-1, 
+                 config_filename=None,
+                 num_agents=10,
+                 input_size=10,
+                 output_size=2,
+                 id=-1,
                  num_objs=2):
-        
+
         if joint_policy is None:
             self.joint_policy = [Policy.Policy(config_filename, input_size=input_size, output_size=output_size) for _ in range(num_agents)]
         else:
             self.joint_policy = joint_policy
-        self.id = id
         self.num_objs = num_objs
+        # Fields live on the individual until it joins a Population
+        self.population = None
+        self.row = -1
+        self.unbind(id=id, fitness=numpy.full(num_objs, -1.0), evaluated=False, trajectory=None, cf_fitnesses=None)
 
-        self.trajectory = None
+        self.invalidate_evaluation()
+
+    def bind(self, population, row):
+        """Make the individual a view of a Population row holding its fields."""
+        self.population = population
+        self.row = row
+
+    def unbind(self, id, fitness, evaluated, trajectory, cf_fitnesses):
+        """Hold the given fields on the individual itself, outside any Population."""
+        self.population = None
+        self.row = -1
+        self._id = id
+        self._fitness = fitness
+        self._evaluated = evaluated
+        self._trajectory = trajectory
+        self._cf_fitnesses = cf_fitnesses
+
+    def detached_fields(self):
+        """Fields of an individual outside any Population, by name."""
+        return {'id': self._id, 'fitness': self._fitness, 'evaluated': self._evaluated, 'trajectory': self._trajectory, 'cf_fitnesses': self._cf_fitnesses}
 
-        self.reset_fitness()
-    
     def reset_fitness(self):
         """Zero the fitness of the individual."""
-        self.fitness = [-1 for _ in range(self.num_objs)]
-    
+        self.fitness[:] = -1
+
+    def invalidate_evaluation(self):
+        """Drop the cached rollout results, so the individual is rolled out again at its next evaluation."""
+        self.evaluated = False
+        self.trajectory = None
+        self.cf_fitnesses = None # Per-policy counterfactual fitnesses of the trajectory, filled in on first use
+        self.reset_fitness()
+
     def mutate(self):
         """Mutate each policy in the joint policy"""
         for p in self.joint_policy:
             p.mutate()
-    
+        # The cached evaluation belongs to the old parameters
+        self.invalidate_evaluation()
+
     def __str__(self):
         """Define the string representation of the Individual."""
-        return f"Individual(id={self.id}, fitness={self.fitness})"
-    
+        return f"Individual(id={self.id}, fitness={self.fitness.tolist()})"
+
     def __repr__(self):
         """Define the representation of the Individual."""
-        return self.__str__()
\ No newline at end of file
+        return self.__str__()
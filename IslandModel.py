@@ -0,0 +1,183 @@
+import random
+import multiprocessing
+
+import numpy
+import torch
+
+import ConfigRegistry
+import NSGAII
+import KParentNSGAII
+import DMO
+import NSGAII_D
+
+ALGORITHMS = {'nsga2': NSGAII.NSGAII,
+              'kpnsga2': KParentNSGAII.KParentNSGAII,
+              'dmo': DMO.DMO,
+              'nsga2+d': NSGAII_D.NSGAII_D}
+TOPOLOGIES = ('ring', 'fully_connected')
+
+def load_island_config(alg_config_filename):
+    """
+    Island model settings from the optional Islands section of an algorithm config.
+
+    Returns:
+    - settings (dict): num_islands (1, i.e. a single population, if there is no Islands section), topology,
+      migration_interval (generations between migrations) and num_migrants (individuals each island sends per migration).
+    """
+    islands_config = ConfigRegistry.load_config(alg_config_filename).get('Islands', {})
+    settings = {'num_islands': islands_config.get('num_islands', 1),
+                'topology': islands_config.get('topology', 'ring'),
+                'migration_interval': islands_config.get('migration_interval', 10),
+                'num_migrants': islands_config.get('num_migrants', 2)}
+    if settings['topology'] not in TOPOLOGIES:
+        raise ValueError(f"Unknown island topology '{settings['topology']}', expected one of {TOPOLOGIES}.")
+    if settings['migration_interval'] < 1:
+        raise ValueError(f"The migration interval must be at least one generation, got {settings['migration_interval']}.")
+    return settings
+
+def destinations(topology, num_islands, island):
+    """Islands that the given island sends its migrants to."""
+    if topology == 'ring':
+        return [(island + 1) % num_islands]
+    if topology == 'fully_connected':
+        return [other for other in range(num_islands) if other != island]
+    raise ValueError(f"Unknown island topology '{topology}', expected one of {TOPOLOGIES}.")
+
+def sources(topology, num_islands, island):
+    """Islands that the given island receives migrants from."""
+    return [other for other in range(num_islands) if island in destinations(topology, num_islands, other)]
+
+class QueueTransport:
+    def __init__(self, num_islands):
+        """
+        Delivers migration messages between islands running as processes on one machine, with one inbox queue per island.
+
+        Any object with the same send and receive methods can stand in for it, e.g. one backed by sockets or MPI to
+        place islands on several nodes. Messages are (source island, migration number, migrants) tuples of plain
+        Python and NumPy data.
+
+        Parameters:
+        - num_islands (int): Number of islands.
+        """
+        self.inboxes = [multiprocessing.Queue() for _ in range(num_islands)]
+
+    def send(self, destination, message):
+        """Put a message in an island's inbox."""
+        self.inboxes[destination].put(message)
+
+    def receive(self, island):
+        """Wait for the next message in an island's inbox."""
+        return self.inboxes[island].get()
+
+class Island:
+    def __init__(self, island, num_islands, topology, transport):
+        """
+        Migration endpoint of one island.
+
+        Parameters:
+        - island (int): Index of this island.
+        - num_islands (int): Number of islands.
+        - topology (str): 'ring' (each island sends to the next one) or 'fully_connected' (each island sends to all others).
+        - transport: QueueTransport, or another transport with the same interface.
+        """
+        self.island = island
+        self.destinations = destinations(topology, num_islands, island)
+        self.sources = sources(topology, num_islands, island)
+        self.transport = transport
+        self.num_migrations = 0
+        # Messages that arrived for later migrations, by migration number
+        # NOTE: A neighbour can be one migration ahead when it only waits for other islands
+        self.early_messages = {}
+
+    def migrate(self, alg, num_migrants):
+        """
+        Send this island's best individuals to its destinations, then wait for the migrants of all its sources and hand
+        them to the algorithm. Every island migrates after the same generations, so migration also synchronises them,
+        and runs are reproducible whatever the timing of the processes.
+
+        Parameters:
+        - alg: Algorithm instance (centralised or coevolutionary) of this island, right after an evolve call.
+        - num_migrants (int): Number of individuals sent to each destination.
+        """
+        migration = self.num_migrations
+        self.num_migrations += 1
+        emigrants = alg.emigrants(num_migrants)
+        for destination in self.destinations:
+            self.transport.send(destination, (self.island, migration, emigrants))
+
+        messages = self.early_messages.pop(migration, [])
+        while len(messages) < len(self.sources):
+            source, message_migration, migrants = self.transport.receive(self.island)
+            if message_migration == migration:
+                messages.append((source, message_migration, migrants))
+            else:
+                self.early_messages.setdefault(message_migration, []).append((source, message_migration, migrants))
+        # Immigrants in source order, so the result does not depend on arrival order
+        immigrants = [migrant for _, _, migrants in sorted(messages, key=lambda message: message[0]) for migrant in migrants]
+        alg.immigrate(immigrants)
+
+def _run_island(island, alg_name, domain_name, alg_config_filename, env_config_filename, data_filename, seed, traj_write_freq,
+                evaluator, num_workers, settings, transport):
+    # Each island has its own random streams
+    random.seed(seed + island)
+    torch.manual_seed(seed + island)
+    numpy.random.seed(seed + island)
+
+    alg = ALGORITHMS[alg_name](alg_config_filename=alg_config_filename,
+                               domain_name=domain_name,
+                               rover_config_filename=env_config_filename,
+                               data_filename=data_filename,
+                               evaluator=evaluator,
+                               num_workers=num_workers)
+    if getattr(alg, 'steady_state', False):
+        raise ValueError("Islands migrate between generations, steady_state cannot be used with them.")
+    endpoint = Island(island, settings['num_islands'], settings['topology'], transport)
+    for gen in range(alg.num_gens):
+        alg.evolve(gen=gen, traj_write_freq=traj_write_freq)
+        if (gen + 1) % settings['migration_interval'] == 0 and gen < alg.num_gens - 1:
+            endpoint.migrate(alg, settings['num_migrants'])
+    alg.close()
+
+def run_islands(alg_name, domain_name, alg_config_filename, env_config_filename, data_filenames, seed, traj_write_freq,
+                evaluator=None, num_workers=None, transport=None):
+    """
+    Run one population of the algorithm per island, each in its own process, with periodic migration of the best
+    individuals between islands.
+
+    Parameters:
+    - alg_name (str): 'nsga2', 'kpnsga2', 'dmo' or 'nsga2+d'.
+    - domain_name (str): 'rover' or 'beach'.
+    - alg_config_filename (str): Algorithm config, with the Islands section.
+    - env_config_filename (str): Domain config.
+    - data_filenames (list): Save data file of each island.
+    - seed (int): Island i is seeded with seed + i.
+    - traj_write_freq (int): Trajectory logging frequency, as for a single population.
+    - evaluator (str, optional), num_workers (int, optional): Evaluator overrides, applied to every island.
+    - transport (optional): Migration transport. Defaults to a QueueTransport between local processes.
+    """
+    settings = load_island_config(alg_config_filename)
+    if alg_name not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm '{alg_name}', expected one of {tuple(ALGORITHMS)}.")
+    if len(data_filenames) != settings['num_islands']:
+        raise ValueError(f"Expected {settings['num_islands']} data filenames, one per island, but got {len(data_filenames)}.")
+    if transport is None:
+        transport = QueueTransport(settings['num_islands'])
+
+    processes = [multiprocessing.Process(target=_run_island,
+                                         args=(island, alg_name, domain_name, alg_config_filename, env_config_filename,
+                                               data_filenames[island], seed, traj_write_freq, evaluator, num_workers, settings, transport))
+                 for island in range(settings['num_islands'])]
+    for process in processes:
+        process.start()
+    # NOTE: The other islands would wait forever for the migrants of a failed island, so they are stopped too
+    while any(process.is_alive() for process in processes):
+        for process in processes:
+            process.join(timeout=1.0)
+        if any(process.exitcode not in (None, 0) for process in processes):
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+    failed = [island for island, process in enumerate(processes) if process.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"Islands {failed} did not finish successfully.")
@@ -1,6 +1,7 @@
 import math
 import numpy
-import yaml
+
+import ConfigRegistry
 
 class BeachSection:
     def __init__(self, cap):
@@ -23,9 +24,8 @@ class MOBeachEnv:
 
     def _read_config(self):
         """Read and load environment configuration from the YAML file."""
-        with open(self.config_filename, 'r') as config_file:
-            self.config_data = yaml.safe_load(config_file)
-            print('[MOBeachEnv]: YAML config read.')
+        self.config_data = ConfigRegistry.load_config(self.config_filename)
+        print('[MOBeachEnv]: YAML config read.')
 
         self._load_config()
     
@@ -36,44 +36,125 @@ class MOBeachEnv:
         self.num_beach_sections = len(self.config_data['Environment']['sections'])
         self.ep_length = self.config_data['Environment']['ep_length']
         self.beach_sections = [BeachSection(section['capacity']) for section in self.config_data['Environment']['sections']]
+        # Section parameters as arrays, for computing the rewards of every section at once
+        self.capacities = numpy.array([section.cap for section in self.beach_sections], dtype=float)
+        # Row i is the one-hot observation of a tourist in section i
+        self.observation_table = numpy.eye(self.num_beach_sections, dtype=int)
         self.num_agents = 0
         for section in self.config_data['Environment']['sections']:
+            if not (section['capacity'] > 0 and isinstance(section['num_type0_agents'], int) and isinstance(section['num_type1_agents'], int)
+                    and section['num_type0_agents'] >= 0 and section['num_type1_agents'] >= 0):
+                raise ValueError("Each beach section needs a positive capacity and non-negative integer agent counts.")
             self.num_agents = self.num_agents + section['num_type0_agents'] + section['num_type1_agents']
+        # Re-enable full input checks for trusted (interface) calls
+        self.debug_checks = self.config_data['Environment'].get('debug_checks', False)
+
+    def initial_tourists(self):
+        """
+        Starting location and type of every tourist, from the config: for each section, its type-0 tourists then its
+        type-1 tourists.
+
+        Returns:
+        - tourist_locations (np.ndarray): Section index of each tourist.
+        - tourist_types (np.ndarray): Type (0 or 1) of each tourist.
+        """
+        sections = self.config_data['Environment']['sections']
+        counts = numpy.array([[section['num_type0_agents'], section['num_type1_agents']] for section in sections], dtype=int).reshape(-1, 2)
+        # One (section, type) group after the other, in the same order as the counts
+        groups = numpy.arange(2 * self.num_beach_sections)
+        tourists = numpy.repeat(groups, counts.ravel())
+        return tourists // 2, tourists % 2
+
+    def get_occupancy(self, tourist_locations, tourist_types):
+        """
+        Number of tourists of each type in each section, for one timestep or a stack of them.
+
+        Parameters:
+        - tourist_locations (list or np.ndarray): Section of each tourist, or T x num_tourists sections for T timesteps.
+        - tourist_types (list or np.ndarray): Type of each tourist, with the same shape.
+
+        Returns:
+        - tourist_distribution (np.ndarray): num_beach_sections x 2 integer matrix (a row for each section, a column for each type),
+          or T x num_beach_sections x 2 for stacked timesteps.
+        """
+        groups = 2 * numpy.asarray(tourist_locations, dtype=int) + numpy.asarray(tourist_types, dtype=int)
+        num_groups = 2 * self.num_beach_sections
+        # Each timestep counts into its own block of bins
+        num_steps = int(numpy.prod(groups.shape[:-1]))
+        offsets = (num_groups * numpy.arange(num_steps)).reshape(groups.shape[:-1] + (1,))
+        counts = numpy.bincount((groups + offsets).ravel(), minlength=num_steps * num_groups)
+        return counts.reshape(groups.shape[:-1] + (self.num_beach_sections, 2))
+
+    def get_section_rewards(self, tourist_distribution, capacities=None):
+        """
+        Cap and mix reward of every section, as BeachSection.get_cap_reward and get_mix_reward of each section at once.
 
-    def get_global_rewards(self, tourist_locations, tourist_types):
+        Parameters:
+        - tourist_distribution (np.ndarray): Occupancy from get_occupancy, with any leading (e.g. timestep) axes.
+        - capacities (np.ndarray, optional): Capacity of each row of the occupancy, if the rows are not the sections in order.
+
+        Returns:
+        - cap_rewards (np.ndarray), mix_rewards (np.ndarray): Reward of each section, the shape of the occupancy without its type axis.
+        """
+        if capacities is None:
+            capacities = self.capacities
+        occupancy = tourist_distribution.sum(axis=-1)
+        cap_rewards = occupancy * numpy.exp(-occupancy / capacities)
+        mix_rewards = tourist_distribution.min(axis=-1) / numpy.maximum(occupancy * self.num_beach_sections, 1) # NOTE: Empty sections give 0
+        return cap_rewards, mix_rewards
+
+    def get_global_rewards(self, tourist_locations, tourist_types, trusted=False):
         """
         Calculate and return the net reward vector for a list of tourist positions.
         
         Parameters:
-        - tourist_locations (list): List of tourist positions, each element being a non-negative integer.
-        - tourist_types (list): List of tourist types, each element being a 0 or 1
+        - tourist_locations (list or np.ndarray): Tourist positions, each element being a non-negative integer.
+        - tourist_types (list or np.ndarray): Tourist types, each element being a 0 or 1
+        - trusted (bool): Skip the input checks, for callers that have already validated their inputs.
         
         Returns:
         - reward_vector (dict): Dictionary where keys are objectives (obj) and values are rewards for each objective.
         """
-        for i in tourist_locations:
-            if not isinstance(i, (int, numpy.int16, numpy.int32, numpy.int64)):
-                raise ValueError("Tourist locations must be integers.")
-        for t in tourist_types:
-            if not isinstance(t, (int, numpy.int16, numpy.int32, numpy.int64)):
-                raise ValueError("Tourist types must be integers.")
-            assert t in [0, 1], "Tourist type must be 0 or 1."
-        assert len(tourist_locations) == len(tourist_types), "Number of tourists should match in locations and types."
+        if not trusted or self.debug_checks:
+            self.validate_tourists(tourist_locations, tourist_types)
         
         # Convert the agent locations to an occupation distribution
         # A num_beach_sections x 2 matrix (a row for each section)
-        tourist_distribution = numpy.zeros((len(self.beach_sections), 2), dtype=int)
-        for beach_sec, tourist_type in zip(tourist_locations, tourist_types):
-            tourist_distribution[beach_sec][tourist_type] += 1
+        tourist_distribution = self.get_occupancy(tourist_locations, tourist_types)
 
         # Get the global rewards
-        cap_reward = 0
-        mix_reward = 0
-        for i, beach_section in enumerate(self.beach_sections):
-            cap_reward += beach_section.get_cap_reward(sum(tourist_distribution[i]))
-            mix_reward += beach_section.get_mix_reward(tourist_distribution[i], self.num_beach_sections)
+        cap_rewards, mix_rewards = self.get_section_rewards(tourist_distribution)
         
-        return {0 : cap_reward, 1 : mix_reward}
+        return {0 : float(cap_rewards.sum()), 1 : float(mix_rewards.sum())}
+
+    def get_leave_one_out_rewards(self, tourist_distributions, tourist_locations, tourist_types):
+        """
+        Global rewards at each timestep with each tourist removed in turn. Removing a tourist only changes the
+        occupancy of its own section, so each reward is the full reward with that section's cap and mix terms
+        swapped for their values with one tourist fewer, in O(1) per tourist and timestep.
+
+        Parameters:
+        - tourist_distributions (np.ndarray): T x num_beach_sections x 2 occupancy of each timestep with every tourist, from get_occupancy.
+        - tourist_locations (np.ndarray): T x num_tourists section of each tourist at each timestep.
+        - tourist_types (np.ndarray): T x num_tourists type of each tourist at each timestep.
+
+        Returns:
+        - cap_rewards (np.ndarray), mix_rewards (np.ndarray): T x num_tourists rewards of each timestep without each tourist.
+        """
+        locations = numpy.asarray(tourist_locations, dtype=int)
+        types = numpy.asarray(tourist_types, dtype=int)
+        cap_rewards, mix_rewards = self.get_section_rewards(tourist_distributions)
+        steps = numpy.arange(len(locations))[:, numpy.newaxis]
+
+        # Occupancy of each tourist's section without that tourist
+        own_section = tourist_distributions[steps, locations] # T x num_tourists x 2
+        own_section_without = own_section - (types[..., numpy.newaxis] == numpy.arange(2))
+        cap_without, mix_without = self.get_section_rewards(own_section_without, self.capacities[locations])
+
+        cap_totals = cap_rewards.sum(axis=-1, keepdims=True)
+        mix_totals = mix_rewards.sum(axis=-1, keepdims=True)
+        return (cap_totals - cap_rewards[steps, locations] + cap_without,
+                mix_totals - mix_rewards[steps, locations] + mix_without)
     
     def generate_observations(self, tourist_locations):
         """
@@ -81,40 +162,41 @@ class MOBeachEnv:
         Each observation will be a list of length self.num_beach_sections,
         with a 1 at the index corresponding to the agent's current section and 0 elsewhere.
         """
-        observations = []
-        for section in tourist_locations:
-            # Use a list comprehension with a conditional expression
-            agent_observation = [1 if i == section else 0 for i in range(self.num_beach_sections)]
-            observations.append(agent_observation)
-
-        return observations
+        return self.observation_table[numpy.asarray(tourist_locations, dtype=int)].tolist()
 
     
-    def update_agent_locations(self, tourist_locations, tourist_deltas):
+    def update_agent_locations(self, tourist_locations, tourist_deltas, trusted=False):
         """
         Update the locations of agents based on their moves.
 
         Parameters:
-        - tourist_locations (list[int]): Current positions of each tourist (0-based index of beach sections).
-        - tourist_deltas (list[int]): Movement decisions for each tourist (-1 for left, 0 for stay, +1 for right).
+        - tourist_locations (list[int] or np.ndarray): Current positions of each tourist (0-based index of beach sections).
+        - tourist_deltas (list[int] or np.ndarray): Movement decisions for each tourist (-1 for left, 0 for stay, +1 for right).
+        - trusted (bool): Skip the input checks, for callers that have already validated their inputs.
 
         Returns:
-        - new_locations (list[int]): Updated positions of each tourist after applying the moves (clamped to valid range).
+        - new_locations (np.ndarray): Updated positions of each tourist after applying the moves (clamped to valid range).
         """
-        new_locations = []
-        for loc, move in zip(tourist_locations, tourist_deltas):
-            new_loc = loc + move
-            if not isinstance(new_loc, (int, numpy.int16, numpy.int32, numpy.int64)):
-                raise ValueError("The move caused agent location to be a float. Invalid. Exiting...")
-            # Check if new_loc is an integer and within the valid range
-            if 0 <= new_loc < self.num_beach_sections:
-                new_locations.append(new_loc)
-            else:
-                # If not valid, do not move the tourist
-                new_locations.append(loc)
-
-        return new_locations
+        locations = numpy.asarray(tourist_locations)
+        new_locations = locations + numpy.asarray(tourist_deltas)
+        if (not trusted or self.debug_checks) and new_locations.dtype.kind not in 'iu':
+            raise ValueError("The move caused agent location to be a float. Invalid. Exiting...")
+        # Tourists moving off either end of the beach do not move
+        return numpy.where((new_locations >= 0) & (new_locations < self.num_beach_sections), new_locations, locations)
     
+    def validate_tourists(self, tourist_locations, tourist_types):
+        """Check that tourist locations are section indices and tourist types are 0 or 1, one of each per tourist."""
+        locations = numpy.asarray(tourist_locations)
+        types = numpy.asarray(tourist_types)
+        if locations.size and locations.dtype.kind not in 'iu':
+            raise ValueError("Tourist locations must be integers.")
+        if types.size and types.dtype.kind not in 'iu':
+            raise ValueError("Tourist types must be integers.")
+        if not numpy.all((locations >= 0) & (locations < self.num_beach_sections)):
+            raise ValueError(f"Tourist locations must be section indices between 0 and {self.num_beach_sections - 1}.")
+        assert numpy.all((types == 0) | (types == 1)), "Tourist type must be 0 or 1."
+        assert len(locations) == len(types), "Number of tourists should match in locations and types."
+
     def get_ep_length(self):
         return self.ep_length
 
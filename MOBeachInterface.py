@@ -1,8 +1,7 @@
-import yaml
-import torch
 import numpy as np
 
-from Policy import Policy
+import ConfigRegistry
+from Policy import Policy, PolicyBatch
 from MOBeachEnv import MOBeachEnv
 
 class MOBeachInterface():
@@ -12,8 +11,9 @@ class MOBeachInterface():
         Setup an internal reference to the rover config file
         """
         self.beach_env = MOBeachEnv(beach_config_filename)
-        with open(beach_config_filename, 'r') as config_file:
-            self.config = yaml.safe_load(config_file)
+        self.config = ConfigRegistry.load_config(beach_config_filename) # Same parsed config as the env's
+        # Policy input of a tourist in each section, gathered by section index instead of built per agent and step
+        self.observation_table = self.beach_env.observation_table.astype(np.float32)
     
     # to perform a key-wise sum of two dicts
     def _keywise_sum(self, dict1, dict2):
@@ -33,81 +33,126 @@ class MOBeachInterface():
         if not (isinstance(joint_policy, list) and isinstance(p, Policy) for p in joint_policy):
             raise ValueError("The supplied joint policy should be a list of Policy type objects")
 
+        return self.rollout_batch([joint_policy])[0]
+
+    def rollout_batch(self, joint_policies: list, compact=False):
+        """
+        Perform rollouts of several joint policies in lockstep, one episode per joint policy. At each step the
+        observations of every agent of every team are gathered from the one-hot table by section index, and all the
+        policies pick their moves in one batched forward pass.
+
+        Parameters:
+        - joint_policies: list of joint policies (each a list of policies representing a whole team)
+        - compact (bool): Return each trajectory as arrays instead of per-agent lists of transition dicts.
+
+        Returns:
+        - rollouts (list): (rollout_trajectory, global_reward) for each joint policy, same as calling rollout on each one.
+          A compact trajectory is a dict of 'position' and 'action' (ep_length x team_size integer arrays) and 'type'
+          (team_size integer array). The states are the one-hot rows of the positions, in beach_env.observation_table.
+        """
+        if not (isinstance(joint_policies, list) and all(isinstance(jp, list) and len(jp) == self.get_team_size() for jp in joint_policies)):
+            raise ValueError("The supplied joint policies should be a list of full-team lists of Policy type objects")
+
+        batch_size = len(joint_policies)
+        team_size = self.get_team_size()
         ep_length = self.beach_env.get_ep_length()
 
         # Process the starting agent distribution to set agent locations
-        agent_locations = []
-        agent_types = []
-        for i, section in enumerate(self.config['Environment']['sections']):
-            # Add all type-0 agents for this section
-            for _ in range(section['num_type0_agents']):
-                agent_locations.append(i)
-                agent_types.append(0)
-                
-            # Add all type-1 agents for this section
-            for _ in range(section['num_type1_agents']):
-                agent_locations.append(i)
-                agent_types.append(1)
-        
-        cumulative_global_reward = {}  # Initialize cumulative global reward
+        initial_locations, agent_types = self.beach_env.initial_tourists()
+        agent_locations = np.repeat(initial_locations[np.newaxis], batch_size, axis=0) # batch_size x team_size
+        batch_types = np.broadcast_to(agent_types, agent_locations.shape)
 
-        rollout_trajectory = [[] for _ in range(len(joint_policy))] # List of list of dicts
+        cumulative_global_rewards = np.zeros((batch_size, self.get_num_objs())) # Initialize cumulative global rewards
 
-        for t in range(ep_length):
-            # get each agent's observation at the current position
-            observations_list = self.beach_env.generate_observations(agent_locations) 
-            
-            joint_action = [] # Will store the combined joint action
-
-            # get each agent's move based on corresponding observation
-            for i, policy in enumerate(joint_policy):
-                # extract singe agent's observation
-                agent_observation = observations_list[i]
-                agent_observation_tensor = torch.FloatTensor(agent_observation)
-                # get policy output based on observation
-                action_dist_tensor = policy.forward(agent_observation_tensor, final_activation="softmax")
-                 # Convert to a numpy array without tracking gradient
-                action_dist_vector = action_dist_tensor.squeeze(0).detach().numpy()
-                # Pick the action that has the highest value
-                action = np.argmax(action_dist_vector) - 1 # -1, 0, or +1
-
-                # Add scaled action to the list of agent moves
-                joint_action.append(action)
-
-                # Add the agent's transition to the trajectory
-                rollout_trajectory[i].append(
-                    {
-                        'state' : agent_observation,
-                        'action' : action,
-                        'position': agent_locations[i],  # Store the actual position
-                        'type': agent_types[i],
-                    }
-                )
-
-            # get updated agent positions based on the joint action
-            agent_locations = self.beach_env.update_agent_locations(tourist_locations=agent_locations, 
-                                                                    tourist_deltas=joint_action)
-            
-            # Get the global reward and update the cumulative global reward
-            global_reward = self.beach_env.get_global_rewards(tourist_locations=agent_locations, tourist_types=agent_types)
-            cumulative_global_reward = self._keywise_sum(cumulative_global_reward, global_reward)
+        # Every policy of every team, evaluated together at each step
+        policy_batch = PolicyBatch([policy for joint_policy in joint_policies for policy in joint_policy])
+
+        # ep_length x batch_size x team_size positions and moves, turned into trajectories at the end
+        positions = np.empty((ep_length, batch_size, team_size), dtype=int)
+        moves = np.empty((ep_length, batch_size, team_size), dtype=int)
 
-        return rollout_trajectory, cumulative_global_reward
+        for t in range(ep_length):
+            # get each agent's observation at the current position: a row of the one-hot table
+            observations = self.observation_table[agent_locations.reshape(-1)]
+
+            # get each agent's move based on corresponding observation: the action with the highest probability
+            joint_action = policy_batch.greedy_actions(observations).reshape(batch_size, team_size) - 1 # -1, 0, or +1
+
+            positions[t] = agent_locations
+            moves[t] = joint_action
+
+            # get updated agent positions based on the joint actions
+            agent_locations = self.beach_env.update_agent_locations(tourist_locations=agent_locations,
+                                                                    tourist_deltas=joint_action,
+                                                                    trusted=True)
+
+            # Get the global rewards of every team and update the cumulative global rewards
+            cap_rewards, mix_rewards = self.beach_env.get_section_rewards(self.beach_env.get_occupancy(agent_locations, batch_types))
+            cumulative_global_rewards += np.stack([cap_rewards.sum(axis=-1), mix_rewards.sum(axis=-1)], axis=-1)
+
+        rollouts = []
+        for b in range(batch_size):
+            global_reward = dict(enumerate(cumulative_global_rewards[b].tolist()))
+            if compact:
+                rollouts.append(({'position': positions[:, b], 'action': moves[:, b], 'type': agent_types}, global_reward))
+                continue
+            # Unpack into per-agent lists of transition dicts, with plain Python values
+            rollout_trajectory = [[] for _ in range(team_size)] # List of list of dicts
+            types = agent_types.tolist()
+            for position, move in zip(positions[:, b], moves[:, b]):
+                states, actions, positions_list = self.beach_env.observation_table[position].tolist(), move.tolist(), position.tolist()
+                for i in range(team_size):
+                    # Add the agent's transition to the trajectory
+                    rollout_trajectory[i].append(
+                        {
+                            'state' : states[i],
+                            'action' : actions[i],
+                            'position': positions_list[i],  # Store the actual position
+                            'type': types[i],
+                        }
+                    )
+            rollouts.append((rollout_trajectory, global_reward))
+
+        return rollouts
+
+    def _trajectory_arrays(self, traj):
+        """ep_length x team_size positions and types of a trajectory, in either the compact or the list of dicts form."""
+        if isinstance(traj, dict):
+            return traj['position'], np.broadcast_to(traj['type'], traj['position'].shape)
+        locations = np.array([[transition['position'] for transition in agent_traj] for agent_traj in traj], dtype=int).T
+        types = np.array([[transition['type'] for transition in agent_traj] for agent_traj in traj], dtype=int).T
+        return locations, types
 
     # Function that evaluates a given trajectory for global rewards (without rollout)
     def evaluate_trajectory(self, traj: dict):
-        parsed_trajectory = [
-            ([agent['position'] for agent in timestep], [agent['type'] for agent in timestep])
-            for timestep in zip(*traj)
-        ] # NOTE: this only works for 2-dimensional environments
+        # T x team_size sections and types, from either trajectory form
+        locations, types = self._trajectory_arrays(traj)
 
         cumulative_global_reward = {}  # Initialize cumulative global reward
-        for t, (agent_locations, agent_types) in enumerate(parsed_trajectory):
-            global_reward = self.beach_env.get_global_rewards(tourist_locations=agent_locations, tourist_types=agent_types)
+        for t, (agent_locations, agent_types) in enumerate(zip(locations, types)):
+            global_reward = self.beach_env.get_global_rewards(tourist_locations=agent_locations, tourist_types=agent_types, trusted=True)
             cumulative_global_reward = self._keywise_sum(cumulative_global_reward, global_reward)
         
         return cumulative_global_reward
 
+    # Function that evaluates the trajectory once for every agent left out (without rollout)
+    def evaluate_counterfactuals(self, traj: list):
+        """
+        Global rewards of the trajectory with each agent's experience excluded in turn.
+
+        Parameters:
+        - traj (list or dict): Full-team trajectory, as returned by rollout, or in compact form from rollout_batch.
+
+        Returns:
+        - cf_rewards (list): Reward dict for each agent index, equal to evaluate_trajectory of the trajectory without that agent.
+        """
+        # T x team_size sections and types, and the occupancy of each timestep
+        locations, types = self._trajectory_arrays(traj)
+        distributions = self.beach_env.get_occupancy(locations, types)
+        # NOTE: Leaving out one agent only changes its own section at each timestep, so every counterfactual comes from this one occupancy
+        cap_rewards, mix_rewards = self.beach_env.get_leave_one_out_rewards(distributions, locations, types)
+        return [{0: cap, 1: mix} for cap, mix in zip(cap_rewards.sum(axis=0).tolist(), mix_rewards.sum(axis=0).tolist())]
+
     # Function to get domain-specific information for the algorithm
     def get_state_size(self):
         '''
@@ -1,8 +1,39 @@
-import yaml
-import copy
 import math
 import numpy as np
 
+import ConfigRegistry
+from SpatialGrid import UniformGrid
+
+INT_TYPES = (int, np.int16, np.int32, np.int64)
+NUMBER_TYPES = (int, float, np.int16, np.int32, np.int64, np.float16, np.float32, np.float64)
+
+def validate_locations(locations, num_dimensions):
+    """
+    Check a list of positions once, as a whole, and convert it for the array kernels.
+
+    Parameters:
+    - locations (list): Positions, where each position is a list of num_dimensions non-negative numbers.
+    - num_dimensions (int): Required length of each position.
+
+    Returns:
+    - location_array (np.ndarray): num_positions x num_dimensions float array of the positions.
+    """
+    if not isinstance(locations, list):
+        raise ValueError("Locations must be a list of positions.")
+    for idx, loc in enumerate(locations):
+        if not (isinstance(loc, list) and len(loc) == num_dimensions):
+            raise ValueError(f"Position at index {idx} must be a list of length {num_dimensions}.")
+    location_array = np.array(locations).reshape(len(locations), num_dimensions)
+    # One dtype check and one comparison over all coordinates instead of an isinstance per coordinate
+    if location_array.dtype.kind not in 'biuf' or not np.all(location_array >= 0):
+        raise ValueError("All coordinates in each location must be numbers greater than zero.")
+    return location_array.astype(float)
+
+def validate_timestep(timestep):
+    """Check that timestep is a non-negative integer."""
+    if not isinstance(timestep, INT_TYPES) or timestep < 0:
+        raise ValueError("timestep must be a non-negative integer.")
+
 class POI:
     def __init__(self, obj, location, radius, coupling, obs_window, reward, repeat):
         """
@@ -39,33 +70,24 @@ class POI:
         self.repeat = repeat
 
         # Save initial state for resetting
-        self._initial_obs_window = copy.deepcopy(obs_window)
+        self._initial_obs_window = list(obs_window)
 
-    def get_reward(self, rov_locations, timestep):
+    def get_reward(self, rov_locations, timestep, trusted=False):
         """
         Get the reward value from the POI for a configuration of rover locations and point in the episode.
 
         Parameters:
         - rov_locations (list): Positions of each rover in the environment. Each position is a list of integers > 0.
         - timestep (int): Current timestep in the environment.
+        - trusted (bool): Skip the input checks, for callers that have already validated their inputs.
 
         Returns:
         - reward (float): The reward value based on the observation conditions.
         """
         # Type and value checks
-        if not isinstance(rov_locations, list):
-            raise ValueError("rov_locations must be a list of rover positions.")
-    
-        for loc in rov_locations:
-            if not isinstance(loc, list) or len(loc) != len(self.location):
-                raise ValueError("Each rover location must be a list matching the POI's dimensionality.")
-            if not all(isinstance(coord, (int, float, np.int16, np.int32, np.int64, np.float16, np.float32, np.float64)) and coord >= 0 for coord in loc):
-                print(loc)
-                raise ValueError("All coordinates in each location must be numbers greater than zero.")
-        
-        # Check that timestep is a non-negative integer
-        if not isinstance(timestep, (int, np.int16, np.int32, np.int64)) or timestep < 0:
-            raise ValueError("timestep must be a non-negative integer.")
+        if not trusted:
+            validate_locations(rov_locations, len(self.location))
+            validate_timestep(timestep)
 
         # Check if the current timestep is within the observation window
         if timestep < self.obs_window[0] or timestep > self.obs_window[1]:
@@ -90,7 +112,47 @@ class POI:
 
     def reset(self):
         """Reset the POI to its initial state."""
-        self.obs_window = copy.deepcopy(self._initial_obs_window)
+        self.obs_window = list(self._initial_obs_window)
+
+
+class POIStore:
+    def __init__(self, pois, num_dimensions):
+        """
+        Struct-of-arrays copy of a list of POIs. The POI properties never change during a run, so the only
+        per-episode state is a mask of the non-repeat POIs that have already been observed.
+
+        Parameters:
+        - pois (list): Validated POI instances.
+        - num_dimensions (int): Dimensionality of the POI locations.
+        """
+        self.num_pois = len(pois)
+        self.locations = self._read_only(np.array([poi.location for poi in pois], dtype=np.float64).reshape(self.num_pois, num_dimensions))
+        self.radii = self._read_only(np.array([poi.radius for poi in pois], dtype=np.float64))
+        self.couplings = self._read_only(np.array([poi.coupling for poi in pois], dtype=np.int32))
+        self.obs_windows = self._read_only(np.array([poi.obs_window for poi in pois], dtype=np.float64).reshape(self.num_pois, 2)) # [start, end] per POI
+        self.rewards = self._read_only(np.array([poi.reward for poi in pois], dtype=np.float64))
+        self.repeats = self._read_only(np.array([poi.repeat for poi in pois], dtype=bool))
+        self.objs = self._read_only(np.array([poi.obj for poi in pois], dtype=np.int32))
+
+        # Non-repeat POIs that have already been observed this episode (batch_size x num_pois when batched)
+        self.consumed = np.zeros(self.num_pois, dtype=bool)
+
+    def _read_only(self, array):
+        array.flags.writeable = False
+        return array
+
+    def reset(self, batch_size=None):
+        """
+        Mark every POI as not yet observed.
+
+        Parameters:
+        - batch_size (int): If given, track this many independent episodes.
+        """
+        shape = (self.num_pois,) if batch_size is None else (batch_size, self.num_pois)
+        if self.consumed.shape == shape:
+            self.consumed.fill(False)
+        else:
+            self.consumed = np.zeros(shape, dtype=bool)
 
 
 class MORoverEnv:
@@ -103,9 +165,8 @@ class MORoverEnv:
 
     def _read_config(self):
         """Read and load environment configuration from the YAML file."""
-        with open(self.config_filename, 'r') as config_file:
-            self.config_data = yaml.safe_load(config_file)
-            print('[MORoverEnv]: YAML config read.')
+        self.config_data = ConfigRegistry.load_config(self.config_filename)
+        print('[MORoverEnv]: YAML config read.')
 
         self._load_config()
     
@@ -124,92 +185,176 @@ class MORoverEnv:
         self.poi_obs_temp = self.config_data['Environment']['poi_obs_temp'] # Temp for state info of the pois -> e^-x/temp
         self.agent_obs_temp = self.config_data['Environment']['agent_obs_temp'] # Temp for state info of the agents -> e^-x/temp
         self.include_location_in_obs = self.config_data['Environment']['include_location_in_obs']
+        # Re-enable full input checks inside the (normally unchecked) array kernels
+        self.debug_checks = self.config_data['Environment'].get('debug_checks', False)
 
-        # Initialize POIs and store initial configuration
+        # Initialize (and validate) the POIs, then keep their properties as arrays for the step kernels
         self.pois = [POI(**poi) for poi in self.config_data['Environment']['pois']]
-        self._initial_pois = copy.deepcopy(self.pois)  # Save initial state for reset
+        self.poi_store = POIStore(self.pois, len(self.dimensions))
+        self.dimensions_array = np.array(self.dimensions, dtype=float)
+
+        # Optional uniform grid so that radius queries only look at nearby POIs and rovers
+        self.spatial_index = self.config_data['Environment'].get('spatial_index', False)
+        if self.spatial_index:
+            # Default to cells as wide as the largest observation radius so each query covers a few cells
+            default_cell_size = max(self.config_data.get('Agents', {}).get('observation_radii', [0]) + [self.poi_store.radii.max(initial=0), 1])
+            self.grid = UniformGrid(self.dimensions, self.config_data['Environment'].get('spatial_cell_size', default_cell_size))
+            self.poi_cell_list = self.grid.cell_list(self.poi_store.locations) # POIs are static, bucket them once
+            self.poi_coverage = self.grid.covering_cells(self.poi_store.locations, self.poi_store.radii) # Cells each POI can be observed from
+
+    def reset(self, batch_size=None):
+        """
+        Reset the environment to its initial configuration.
 
-    def reset(self):
-        """Reset the environment to its initial configuration."""
-        # Reload the environment configuration
-        self._load_config()
-        # Reset each POI to its original state
-        for poi in self.pois:
-            poi.reset()
+        Parameters:
+        - batch_size (int): If given, track POI state for this many independent episodes that are stepped together.
+        """
+        # The config is static, so only the per-episode POI state needs resetting
+        self.poi_store.reset(batch_size)
     
-    def get_global_rewards(self, rov_locations, timestep):
+    def get_global_rewards(self, rov_locations, timestep, trusted=False):
         """
         Calculate and return the net reward vector for a list of rover positions at a given timestep.
 
         Parameters:
         - rov_locations (list): List of rover positions, where each position is a list of floats > 0.
         - timestep (int): Current timestep in the environment.
+        - trusted (bool): Skip the input checks, for callers that have already validated their inputs.
 
         Returns:
         - reward_vector (dict): Dictionary where keys are objectives (obj) and values are cumulative rewards for each objective.
         Returns a zero reward vector if reward mode is Final and the timestep is not ep_length - 1.
         """
-        # Initialize the reward vector as a dictionary with objectives as keys and zeroed cumulative rewards
-        reward_vector = {obj: 0 for obj in range(self.num_objs)}
+        # Type and value checks
+        if trusted:
+            rov_locations = np.array(rov_locations, dtype=float).reshape(len(rov_locations), len(self.dimensions))
+        else:
+            rov_locations = validate_locations(rov_locations, len(self.dimensions))
+            validate_timestep(timestep)
+
+        rewards = self.get_global_rewards_array(rov_locations, timestep)
+
+        return dict(enumerate(rewards.tolist()))
+
+    def get_global_rewards_array(self, rov_locations, timestep):
+        """
+        Vectorised counterpart of get_global_rewards.
+
+        Parameters:
+        - rov_locations (np.ndarray): num_rovers x dims array of rover positions,
+          or batch_size x num_rovers x dims if the environment was reset with a batch_size.
+        - timestep (int): Current timestep in the environment.
+
+        Returns:
+        - reward_vector (np.ndarray): Reward for each objective, indexed by obj (batch_size x num_objs when batched).
+        """
+        if self.debug_checks:
+            self._check_rover_array(rov_locations)
+            validate_timestep(timestep)
+
+        batch_shape = rov_locations.shape[:-2]
+        reward_vector = np.zeros(batch_shape + (self.num_objs,))
 
         # check the reward mode. only compute reward if the timestep allows it.
-        if self.global_reward_mode == "Aggregated" or (self.global_reward_mode == "Final" and timestep == self.ep_length - 1):
-            # Calculate rewards for each POI and update the reward vector
-            for poi in self.pois:
-                reward = poi.get_reward(rov_locations, timestep)
-                if reward > 0:
-                    reward_vector[poi.obj] += reward
+        if not (self.global_reward_mode == "Aggregated" or (self.global_reward_mode == "Final" and timestep == self.ep_length - 1)):
+            return reward_vector
+
+        # Count rovers within each POI's observation radius
+        observing_rovers = self._observing_rovers(rov_locations)
+
+        # POIs that are inside their observation window, not yet used up, and meet the coupling requirement
+        in_window = (self.poi_store.obs_windows[:, 0] <= timestep) & (timestep <= self.poi_store.obs_windows[:, 1])
+        observed = in_window & ~self.poi_store.consumed & (observing_rovers >= self.poi_store.couplings)
 
+        # POIs that can only be observed once are disabled for the rest of the episode
+        self.poi_store.consumed |= observed & ~self.poi_store.repeats
+
+        # Sum the rewards of the observed POIs per objective (and per episode when batched)
+        num_episodes = int(np.prod(batch_shape))
+        observed = observed.reshape(num_episodes, self.poi_store.num_pois)
+        obj_bins = (np.arange(num_episodes)[:, np.newaxis] * self.num_objs + self.poi_store.objs)[observed]
+        poi_rewards = np.broadcast_to(self.poi_store.rewards, observed.shape)[observed]
+        reward_vector += np.bincount(obj_bins, weights=poi_rewards, minlength=num_episodes * self.num_objs).reshape(reward_vector.shape)
         return reward_vector
     
-    def get_local_rewards(self, rov_locations):
+    def get_counterfactual_rewards_array(self, rov_trajectory):
+        """
+        Total episode reward with each rover removed in turn, from a single pass over the trajectory.
+
+        Every POI's observer count is recorded once per timestep. Removing rover i only lowers the count of the POIs
+        it was observing, so each leave-one-out team's successful observations follow from those counts directly.
+        A non-repeat POI pays out once if any timestep succeeds (it is consumed at the first one), a repeat POI
+        pays out at every successful timestep.
+
+        Parameters:
+        - rov_trajectory (np.ndarray): ep_steps x num_rovers x dims array of rover positions at every timestep.
+
+        Returns:
+        - reward_vectors (np.ndarray): num_rovers x num_objs array, row i is the cumulative reward of the team without rover i.
+        """
+        num_steps, num_rovers = rov_trajectory.shape[:2]
+        num_pois = self.poi_store.num_pois
+        reward_vectors = np.zeros((num_rovers, self.num_objs))
+        if num_rovers == 1:
+            return reward_vectors # An empty team has no timesteps to evaluate
+
+        # Which rover observes which POI at each timestep: ep_steps x num_rovers x num_pois
+        deltas = rov_trajectory[:, :, np.newaxis, :] - self.poi_store.locations
+        observing = np.sqrt(np.sum(deltas ** 2, axis=-1)) < self.poi_store.radii
+        observer_counts = np.count_nonzero(observing, axis=1)
+
+        # Timesteps at which each POI can reward, given the reward mode and its observation window
+        timesteps = np.arange(num_steps)
+        if self.global_reward_mode == "Aggregated":
+            rewarding_steps = np.ones(num_steps, dtype=bool)
+        else:
+            rewarding_steps = (self.global_reward_mode == "Final") & (timesteps == self.ep_length - 1)
+        in_window = rewarding_steps[:, np.newaxis] & (self.poi_store.obs_windows[:, 0] <= timesteps[:, np.newaxis]) & (timesteps[:, np.newaxis] <= self.poi_store.obs_windows[:, 1])
+
+        # Coupling met without each rover: num_rovers x ep_steps x num_pois
+        cf_counts = observer_counts[np.newaxis, :, :] - observing.transpose(1, 0, 2)
+        observed = in_window & (cf_counts >= self.poi_store.couplings)
+        num_payouts = np.where(self.poi_store.repeats, np.count_nonzero(observed, axis=1), np.any(observed, axis=1))
+
+        # Sum the rewards per objective for each leave-one-out team
+        obj_bins = np.arange(num_rovers)[:, np.newaxis] * self.num_objs + self.poi_store.objs
+        reward_vectors += np.bincount(obj_bins.ravel(), weights=(num_payouts * self.poi_store.rewards).ravel(), minlength=num_rovers * self.num_objs).reshape(num_rovers, self.num_objs)
+        return reward_vectors
+
+    def get_local_rewards(self, rov_locations, trusted=False):
         """
         Calculate and return the inverse of distance to closest POI for each rover in a list of rover positions.
         
         Parameters:
         - rov_locations (list): List of rover positions, where each position is a list of floats > 0.
+        - trusted (bool): Skip the input checks, for callers that have already validated their inputs.
         
         Returns:
         - local_rewards (list): List of local rewards where each element corresponds to a rover.
         """
         # Type and value checks
-        if not isinstance(rov_locations, list):
-            raise ValueError("rov_locations must be a list of rover positions.")
-        num_dimensions = len(self.dimensions)
-        for idx, loc in enumerate(rov_locations):
-            if not (isinstance(loc, list) and len(loc) == num_dimensions):
-                raise ValueError(f"Rover position at index {idx} must be a list of length {num_dimensions}.")
-            if not all(isinstance(coord, (int, float, np.int16, np.int32, np.int64, np.float16, np.float32, np.float64)) and coord >= 0 for coord in loc):
-                raise ValueError(f"All coordinates for rover at index", idx, "must be numbers greater than zero.")
-
-        # Initialize an empty local reward list
-        local_rewards = []
-
-        # Calculate local reward for each rover
-        for rover_pos in rov_locations:
-            min_distance = float('inf')
-            for poi in self.pois:
-                # Calculate Euclidean distance in N dimensions
-                distance = math.sqrt(sum((r - p) ** 2 for r, p in zip(rover_pos, poi.location)))
-                if distance < min_distance:
-                    min_distance = distance
-
-            # check the reward mode and reward accordingly
-            if self.local_reward_mode == "inverse_distance":
-                # Inverse of distance as local reward, handle division by zero
-                if min_distance > 0:
-                    local_reward = self.local_reward_kneecap / min_distance # NOTE: Reward value could be huge
-                else:
-                    local_reward = float('inf')  # If distance is zero, assign infinite reward or a predefined max value
-            elif self.local_reward_mode == "exponential":
-                # e^-min_distance
-                local_reward = math.exp(-min_distance/self.local_reward_temp)
-            local_rewards.append(local_reward)
+        if trusted:
+            rov_locations = np.array(rov_locations, dtype=float).reshape(len(rov_locations), len(self.dimensions))
+        else:
+            rov_locations = validate_locations(rov_locations, len(self.dimensions))
+
+        # Distance from each rover to its closest POI
+        deltas = rov_locations[:, np.newaxis, :] - self.poi_store.locations
+        min_distances = np.sqrt(np.sum(deltas ** 2, axis=-1)).min(axis=1, initial=float('inf'))
+
+        # check the reward mode and reward accordingly
+        if self.local_reward_mode == "inverse_distance":
+            # Inverse of distance as local reward, handle division by zero
+            # NOTE: Reward value could be huge. If distance is zero, assign infinite reward
+            local_rewards = np.divide(self.local_reward_kneecap, min_distances, out=np.full(min_distances.shape, float('inf')), where=min_distances > 0)
+        elif self.local_reward_mode == "exponential":
+            # e^-min_distance
+            local_rewards = np.exp(-min_distances/self.local_reward_temp)
         
-        return local_rewards
+        return local_rewards.tolist()
 
     
-    def update_agent_locations(self, agent_locations, agent_deltas, max_step_sizes):
+    def update_agent_locations(self, agent_locations, agent_deltas, max_step_sizes, trusted=False):
         """
         Update agent locations based on movement deltas and max step sizes (Euclidean), respecting environment boundaries.
 
@@ -217,175 +362,327 @@ class MORoverEnv:
         - agent_locations (list): Current positions of each agent, where each position is a list of coordinates.
         - agent_deltas (list): Movement deltas for each agent, with each delta list matching the dimensions of agent locations.
         - max_step_sizes (list): Maximum allowable Euclidean step size for each agent.
+        - trusted (bool): Skip the input checks, for callers that have already validated their inputs.
 
         Returns:
         - updated_locations (list): New list of agent locations after applying scaled deltas and respecting boundaries.
         """
-        if not (isinstance(agent_locations, list) and isinstance(agent_deltas, list) and isinstance(max_step_sizes, list)):
-            raise ValueError("agent_locations, agent_deltas, and max_step_sizes must all be lists.")
-        if not (len(agent_locations) == len(agent_deltas) == len(max_step_sizes)):
-            raise ValueError("agent_locations, agent_deltas, and max_step_sizes must have the same length.")
+        if not trusted:
+            if not (isinstance(agent_locations, list) and isinstance(agent_deltas, list) and isinstance(max_step_sizes, list)):
+                raise ValueError("agent_locations, agent_deltas, and max_step_sizes must all be lists.")
+            if not (len(agent_locations) == len(agent_deltas) == len(max_step_sizes)):
+                raise ValueError("agent_locations, agent_deltas, and max_step_sizes must have the same length.")
+            for loc, delta in zip(agent_locations, agent_deltas):
+                if not (len(loc) == len(delta) == len(self.dimensions)):
+                    print("Loc:", loc, "Delta:", delta, "Env dims:", self.dimensions)
+                    raise ValueError("Each agent's location and delta must match the environment's dimensionality.")
+
+        num_agents, num_dimensions = len(agent_locations), len(self.dimensions)
+        updated_locations = self.update_agent_locations_array(np.array(agent_locations, dtype=float).reshape(num_agents, num_dimensions),
+                                                              np.array(agent_deltas, dtype=float).reshape(num_agents, num_dimensions),
+                                                              np.array(max_step_sizes, dtype=float))
+
+        return updated_locations.tolist()
+
+    def update_agent_locations_array(self, agent_locations, agent_deltas, max_step_sizes):
+        """
+        Vectorised counterpart of update_agent_locations.
 
-        updated_locations = []
+        Parameters:
+        - agent_locations (np.ndarray): num_agents x dims array of current positions (optionally with a leading batch axis).
+        - agent_deltas (np.ndarray): Movement deltas, same shape as agent_locations.
+        - max_step_sizes (np.ndarray): Maximum allowable Euclidean step size for each agent.
 
-        for loc, delta, max_step in zip(agent_locations, agent_deltas, max_step_sizes):
-            if not (len(loc) == len(delta) == len(self.dimensions)):
-                print("Loc:", loc, "Delta:", delta, "Env dims:", self.dimensions)
+        Returns:
+        - updated_locations (np.ndarray): New positions, same shape as agent_locations.
+        """
+        if self.debug_checks:
+            self._check_rover_array(agent_locations, max_step_sizes)
+            if agent_deltas.shape != agent_locations.shape:
                 raise ValueError("Each agent's location and delta must match the environment's dimensionality.")
+        # Calculate the Euclidean norm of each delta
+        norms = np.sqrt(np.sum(agent_deltas ** 2, axis=-1))
 
-            # Calculate the Euclidean norm of the delta
-            norm = math.sqrt(sum(d_i ** 2 for d_i in delta))
-            
-            # Scale delta if norm exceeds max_step
-            if norm > max_step:
-                scale = max_step / norm
-                delta = [d_i * scale for d_i in delta]
-
-            # Calculate new location with boundaries applied
-            new_location = []
-            for i, (coord, delta_i, max_dim) in enumerate(zip(loc, delta, self.dimensions)):
-                updated_coord = coord + delta_i
-                updated_coord = max(0, min(updated_coord, max_dim))  # Enforce boundaries
-                new_location.append(updated_coord)
+        # Scale deltas whose norm exceeds the max step
+        scales = np.divide(max_step_sizes, norms, out=np.ones_like(norms), where=norms > max_step_sizes)
+        updated_locations = agent_locations + agent_deltas * scales[..., np.newaxis]
 
-            updated_locations.append(new_location)
+        return np.clip(updated_locations, 0, self.dimensions_array)  # Enforce boundaries
 
-        return updated_locations
-
-    def generate_observations(self, rover_locations, num_sensors_list, observation_radius_list, normalise=False):
+    def generate_observations(self, rover_locations, num_sensors_list, observation_radius_list, normalise=False, trusted=False):
         """
         Generate observations for all rovers based on their positions, sensors, and observation radii.
 
         Parameters:
         - rover_locations (list): Positions of each rover. Each position is a list of coordinates.
-        - num_sensors_list (list): Number of sensors (cones) for each rover.
+        - num_sensors_list (list): Number of sensors (cones) for each rover, which can differ between rovers.
         - observation_radius_list (list): Observation radius for each rover.
         - normalise (bool): Normalise the agent's location wrt environment dimensions
+        - trusted (bool): Skip the input checks, for callers that have already validated their inputs.
 
         Returns:
         - observations_list (list): List of observations for each rover.
           Each observation is a list containing the (OPTIONAL: rover's position followed by) counts/densities of POIs and agents.
         """
-        if not (isinstance(rover_locations, list) and isinstance(num_sensors_list, list) and isinstance(observation_radius_list, list)):
-            raise ValueError("rover_locations, num_sensors_list, and observation_radius_list must all be lists.")
-        if not (len(rover_locations) == len(num_sensors_list) == len(observation_radius_list)):
-            raise ValueError("rover_locations, num_sensors_list, and observation_radius_list must have the same length.")
-
-        observations_list = []
         num_dimensions = len(self.dimensions)
 
-        for idx, (rover_pos, num_sensors, obs_radius) in enumerate(zip(rover_locations, num_sensors_list, observation_radius_list)):
-            if not (isinstance(rover_pos, list) and len(rover_pos) == num_dimensions):
-                raise ValueError(f"Rover position at index {idx} must be a list of length {num_dimensions}.")
-            if not isinstance(num_sensors, (int, np.int16, np.int32, np.int64)) or num_sensors <= 0:
+        if trusted:
+            rover_locations = np.array(rover_locations, dtype=float).reshape(len(rover_locations), num_dimensions)
+        else:
+            if not (isinstance(rover_locations, list) and isinstance(num_sensors_list, list) and isinstance(observation_radius_list, list)):
+                raise ValueError("rover_locations, num_sensors_list, and observation_radius_list must all be lists.")
+            if not (len(rover_locations) == len(num_sensors_list) == len(observation_radius_list)):
+                raise ValueError("rover_locations, num_sensors_list, and observation_radius_list must have the same length.")
+            rover_locations = validate_locations(rover_locations, num_dimensions)
+            self.validate_sensors(num_sensors_list, observation_radius_list)
+
+        observation_radii = np.array(observation_radius_list, dtype=float)
+        if num_dimensions != 2 or len(set(num_sensors_list)) == 1:
+            return self.generate_observations_array(rover_locations, num_sensors_list, observation_radii, normalise=normalise).tolist()
+
+        # Rovers with different numbers of sensors have observations of different sizes: bin for each number of sensors
+        # in turn, and keep the observations of the rovers that have it
+        observations_list = [None] * len(num_sensors_list)
+        for num_sensors in set(num_sensors_list):
+            observations = self.generate_observations_array(rover_locations, [num_sensors] * len(num_sensors_list), observation_radii, normalise=normalise)
+            for idx, rover_sensors in enumerate(num_sensors_list):
+                if rover_sensors == num_sensors:
+                    observations_list[idx] = observations[idx].tolist()
+
+        return observations_list
+
+    def generate_observations_array(self, rover_locations, num_sensors_list, observation_radii, normalise=False):
+        """
+        Vectorised counterpart of generate_observations.
+
+        Parameters:
+        - rover_locations (np.ndarray): num_rovers x dims array of rover positions (optionally with a leading batch axis).
+        - num_sensors_list (list): Number of sensors (cones) for each rover. Must be the same for every rover.
+        - observation_radii (np.ndarray): Observation radius for each rover.
+        - normalise (bool): Normalise the agent's location wrt environment dimensions
+
+        Returns:
+        - observations (np.ndarray): num_rovers x obs_size array with one observation per row (batch_size x num_rovers x obs_size when batched).
+        """
+        if self.debug_checks:
+            self._check_rover_array(rover_locations, observation_radii)
+            self.validate_sensors(num_sensors_list, observation_radii.tolist())
+
+        num_rovers, num_dimensions = rover_locations.shape[-2:]
+        num_pois = self.poi_store.num_pois
+        # Rovers of all episodes are handled as one flat list of rows
+        flat_locations = rover_locations.reshape(-1, num_dimensions)
+        num_rows = flat_locations.shape[0]
+
+        observation_parts = []
+
+        # Whether to include agent's location in observations
+        if self.include_location_in_obs:
+            # Choose to normalise or not and add the agent location 
+            observation_parts.append(flat_locations / self.dimensions_array if normalise else flat_locations)
+
+        # (rover, POI) and (rover, other rover) pairs within each rover's observation radius
+        poi_rows, poi_idx, poi_deltas, poi_distances = self._pois_in_range(flat_locations, np.tile(observation_radii, num_rows // num_rovers))
+        agent_rows, agent_deltas, agent_distances = self._agents_in_range(rover_locations.reshape(-1, num_rovers, num_dimensions), observation_radii)
+
+        if num_dimensions == 1:
+            # 1D environment
+            observation_parts.append(np.bincount(poi_rows, minlength=num_rows)[:, np.newaxis] / num_pois) # normalise wrt total pois
+            observation_parts.append(np.bincount(agent_rows, minlength=num_rows)[:, np.newaxis] / num_rovers) # Normalise wrt total rovers
+
+        elif num_dimensions == 2:
+            # 2D environment
+            if len(set(num_sensors_list)) != 1:
+                raise ValueError("Array observations require the same number of sensors on every rover.")
+            num_cones = int(num_sensors_list[0])
+            cone_angle = 360.0 / num_cones
+
+            # POI counts/densities in each cone, one block of cones per objective
+            poi_bins = self.poi_store.objs[poi_idx] * num_cones + self._cone_indices(poi_deltas, cone_angle, num_cones)
+            poi_counts, poi_densities = self._binned_counts(poi_rows, poi_bins, poi_distances, self.poi_obs_temp, num_rows, num_cones * self.num_objs)
+
+            # Agent counts/densities in each cone
+            agent_bins = self._cone_indices(agent_deltas, cone_angle, num_cones)
+            agent_counts, agent_densities = self._binned_counts(agent_rows, agent_bins, agent_distances, self.agent_obs_temp, num_rows, num_cones)
+
+            # Add counts to observations
+            if self.observation_mode == 'count':
+                observation_parts.append(poi_counts / num_pois) # Normalise the POI count
+                observation_parts.append(agent_counts / num_rovers) # Normalise the agent count
+            elif self.observation_mode == 'density':
+                observation_parts.append(poi_densities)
+                observation_parts.append(agent_densities)
+
+        else:
+            raise NotImplementedError("Observation generation is only implemented for 1D and 2D environments.")
+
+        return np.concatenate(observation_parts, axis=-1).reshape(rover_locations.shape[:-1] + (-1,))
+
+    def _distances(self, deltas):
+        """Euclidean length of each offset (last axis), computed the same way for dense and grid queries."""
+        if deltas.shape[-1] == 1:
+            return np.abs(deltas[..., 0])
+        if deltas.shape[-1] == 2:
+            return np.hypot(deltas[..., 0], deltas[..., 1])
+        return np.sqrt(np.sum(deltas ** 2, axis=-1))
+
+    def _pois_in_range(self, rover_locations, observation_radii):
+        """
+        Find the POIs within each rover's observation radius.
+
+        Parameters:
+        - rover_locations (np.ndarray): num_rovers x dims array of rover positions.
+        - observation_radii (np.ndarray): Observation radius of each rover.
+
+        Returns:
+        - rover_idx, poi_idx (np.ndarray): Rover and POI of each in-range pair, sorted by rover then POI.
+        - deltas (np.ndarray): POI location minus rover location for each pair.
+        - distances (np.ndarray): Distance between the rover and POI of each pair.
+        """
+        if self.spatial_index:
+            rover_idx, poi_idx = self.grid.query_pairs(rover_locations, observation_radii, self.poi_cell_list)
+            deltas = self.poi_store.locations[poi_idx] - rover_locations[rover_idx]
+            distances = self._distances(deltas)
+            in_range = distances <= observation_radii[rover_idx]
+            return rover_idx[in_range], poi_idx[in_range], deltas[in_range], distances[in_range]
+
+        deltas = self.poi_store.locations - rover_locations[:, np.newaxis, :]
+        distances = self._distances(deltas)
+        rover_idx, poi_idx = np.nonzero(distances <= observation_radii[:, np.newaxis])
+        return rover_idx, poi_idx, deltas[rover_idx, poi_idx], distances[rover_idx, poi_idx]
+
+    def _agents_in_range(self, rover_locations, observation_radii):
+        """
+        Find the other rovers (of the same episode) within each rover's observation radius.
+
+        Parameters:
+        - rover_locations (np.ndarray): num_episodes x num_rovers x dims array of rover positions.
+        - observation_radii (np.ndarray): Observation radius of each rover.
+
+        Returns:
+        - rover_rows (np.ndarray): Flat (episode * num_rovers + rover) row of the observing rover of each pair, sorted by row then other rover.
+        - deltas (np.ndarray): Other rover location minus rover location for each pair.
+        - distances (np.ndarray): Distance between the two rovers of each pair.
+        """
+        num_episodes, num_rovers, num_dimensions = rover_locations.shape
+
+        if self.spatial_index:
+            flat_locations = rover_locations.reshape(-1, num_dimensions)
+            flat_radii = np.tile(observation_radii, num_episodes)
+            episodes = np.repeat(np.arange(num_episodes), num_rovers)
+            rover_cell_list = self.grid.cell_list(flat_locations, groups=episodes, num_groups=num_episodes) # Rovers move, so bucket them every step
+            rover_rows, other_rows = self.grid.query_pairs(flat_locations, flat_radii, rover_cell_list, groups=episodes)
+            deltas = flat_locations[other_rows] - flat_locations[rover_rows]
+            distances = self._distances(deltas)
+            in_range = (distances <= flat_radii[rover_rows]) & (other_rows != rover_rows) # Skip self
+            return rover_rows[in_range], deltas[in_range], distances[in_range]
+
+        deltas = rover_locations[:, np.newaxis, :, :] - rover_locations[:, :, np.newaxis, :]
+        distances = self._distances(deltas)
+        in_range = (distances <= observation_radii[:, np.newaxis]) & ~np.eye(num_rovers, dtype=bool) # Skip self
+        episode_idx, rover_idx, other_idx = np.nonzero(in_range)
+        return episode_idx * num_rovers + rover_idx, deltas[episode_idx, rover_idx, other_idx], distances[episode_idx, rover_idx, other_idx]
+
+    def _observing_rovers(self, rov_locations):
+        """
+        Count the rovers strictly within each POI's observation radius.
+
+        Parameters:
+        - rov_locations (np.ndarray): num_rovers x dims array of rover positions (optionally with a leading batch axis).
+
+        Returns:
+        - observing_rovers (np.ndarray): Number of observing rovers per POI (batch_size x num_pois when batched).
+        """
+        if not self.spatial_index:
+            # Distance from every rover to every POI: num_rovers x num_pois
+            deltas = rov_locations[..., :, np.newaxis, :] - self.poi_store.locations
+            distances = np.sqrt(np.sum(deltas ** 2, axis=-1))
+            return np.count_nonzero(distances < self.poi_store.radii, axis=-2)
+
+        num_rovers, num_dimensions = rov_locations.shape[-2:]
+        num_pois = self.poi_store.num_pois
+        flat_locations = rov_locations.reshape(-1, num_dimensions)
+        num_episodes = flat_locations.shape[0] // num_rovers
+        episodes = np.repeat(np.arange(num_episodes), num_rovers)
+        rover_cell_list = self.grid.cell_list(flat_locations, groups=episodes, num_groups=num_episodes)
+
+        # Look up the rovers in the cells around every POI of every episode
+        coverage_poi, coverage_cells = self.poi_coverage
+        query_episodes = np.repeat(np.arange(num_episodes), len(coverage_poi))
+        query_idx, rover_rows = self.grid.gather(query_episodes * self.grid.num_cells + np.tile(coverage_cells, num_episodes), rover_cell_list)
+        poi_idx = np.tile(coverage_poi, num_episodes)[query_idx]
+
+        distances = np.sqrt(np.sum((flat_locations[rover_rows] - self.poi_store.locations[poi_idx]) ** 2, axis=-1))
+        observing = distances < self.poi_store.radii[poi_idx]
+        observing_rovers = np.bincount((episodes[rover_rows] * num_pois + poi_idx)[observing], minlength=num_episodes * num_pois)
+        return observing_rovers.reshape(rov_locations.shape[:-2] + (num_pois,))
+
+    def _cone_indices(self, deltas, cone_angle, num_cones):
+        """Sensor cone that each 2D offset falls into, measured counter-clockwise from the x axis."""
+        angles = np.degrees(np.arctan2(deltas[..., 1], deltas[..., 0])) % 360
+        # Clamp the cone index so we never go out of range (floating point edge case errors of atan2)
+        return np.minimum((angles // cone_angle).astype(int), num_cones - 1)
+
+    def _binned_counts(self, rows, bins, distances, temp, num_rows, num_bins):
+        """
+        Count the in-range entities in each bin of each rover, along with their average e^-distance/temp density.
+
+        Parameters:
+        - rows (np.ndarray): Observing rover (flat row) of each in-range entity.
+        - bins (np.ndarray): Bin index of each in-range entity.
+        - distances (np.ndarray): Distance from the rover to each in-range entity.
+        - temp (float): Temperature of the density.
+        - num_rows (int): Number of observing rovers.
+        - num_bins (int): Number of bins per rover.
+
+        Returns:
+        - counts (np.ndarray): num_rows x num_bins entity counts.
+        - densities (np.ndarray): num_rows x num_bins average densities (0 for empty bins).
+        """
+        flat_bins = rows * num_bins + bins
+        counts = np.bincount(flat_bins, minlength=num_rows * num_bins).reshape(num_rows, num_bins)
+        density_sums = np.bincount(flat_bins, weights=np.exp(-distances / temp), minlength=num_rows * num_bins).reshape(num_rows, num_bins)
+        # Average the densities
+        densities = np.divide(density_sums, counts, out=np.zeros(counts.shape), where=counts > 0)
+        return counts, densities
+
+    def validate_sensors(self, num_sensors_list, observation_radius_list):
+        """Check that every rover has a positive integer number of sensors and a non-negative observation radius."""
+        for idx, (num_sensors, obs_radius) in enumerate(zip(num_sensors_list, observation_radius_list)):
+            if not isinstance(num_sensors, INT_TYPES) or num_sensors <= 0:
                 raise ValueError(f"Number of sensors for rover at index {idx} must be a positive integer.")
-            if not (isinstance(obs_radius, (int, float, np.int16, np.int32, np.int64, np.float16, np.float32, np.float64)) and obs_radius >= 0):
+            if not (isinstance(obs_radius, NUMBER_TYPES) and obs_radius >= 0):
                 raise ValueError(f"Observation radius for rover at index {idx} must be a non-negative number.")
 
-            observation = []
-
-            # Whether to include agent's location in observations
-            if self.include_location_in_obs:
-                # Choose to normalise or not and add the agent location 
-                if not normalise:
-                    observation.extend(rover_pos)
-                else:
-                    observation.extend(np.divide(rover_pos, self.dimensions))
-
-            # Initialize observations
-            if num_dimensions == 1:
-                # 1D environment
-                poi_count = 0
-                agent_count = 0
-
-                # Count POIs within observation radius
-                for poi in self.pois:
-                    distance = abs(poi.location[0] - rover_pos[0])
-                    if distance <= obs_radius:
-                        poi_count += 1
-
-                # Count other agents within observation radius
-                for other_idx, other_pos in enumerate(rover_locations):
-                    if other_idx == idx:
-                        continue  # Skip self
-                    distance = abs(other_pos[0] - rover_pos[0])
-                    if distance <= obs_radius:
-                        agent_count += 1
-
-                # Add counts to observations
-                observation.append(poi_count / len(self.pois)) # normalise wrt total pois
-                observation.append(agent_count / len(rover_locations)) # Normalise wrt total rovers
-
-            elif num_dimensions == 2:
-                # 2D environment
-                num_cones = num_sensors
-                cone_angle = 360.0 / num_cones
-                poi_counts = [0] * num_cones * self.num_objs # distinct poi observations for each objective
-                poi_densities = [0] * num_cones * self.num_objs # distinct poi observations for each objective
-                agent_counts = [0] * num_cones
-                agent_densities = [0] * num_cones
-
-                # Count POIs within observation radius and cones
-                for poi in self.pois:
-                    dx = poi.location[0] - rover_pos[0]
-                    dy = poi.location[1] - rover_pos[1]
-                    distance = math.hypot(dx, dy)
-
-                    if distance <= obs_radius:
-                        angle = math.degrees(math.atan2(dy, dx)) % 360
-                        cone_index = int(angle // cone_angle)
-                        poi_counts[poi.obj*num_cones + cone_index] += 1
-                        poi_densities[poi.obj*num_cones + cone_index] += math.exp(-distance/self.poi_obs_temp)
-
-                # Count other agents within observation radius and cones
-                for other_idx, other_pos in enumerate(rover_locations):
-                    if other_idx == idx:
-                        continue  # Skip self
-                    dx = other_pos[0] - rover_pos[0]
-                    dy = other_pos[1] - rover_pos[1]
-                    distance = math.hypot(dx, dy)
-
-                    if distance <= obs_radius:
-                        angle = math.degrees(math.atan2(dy, dx)) % 360
-                        cone_index = int(angle // cone_angle)
-
-                        # Clamp the cone_index so we never go out of range
-                        if cone_index == num_cones:
-                            cone_index = num_cones - 1 # avoid the floating point edge case errors of atan2
-                        
-                        agent_counts[cone_index] += 1
-                        agent_densities[cone_index] += math.exp(-distance/self.agent_obs_temp)
-                
-                # Average the poi densities
-                for cone_idx in range(len(poi_densities)):
-                    poi_densities[cone_idx] = poi_densities[cone_idx] / poi_counts[cone_idx] if poi_counts[cone_idx] > 0 else 0
-                
-                # Average the agent densities
-                for cone_idx in range(len(agent_densities)):
-                    agent_densities[cone_idx] = agent_densities[cone_idx] / agent_counts[cone_idx] if agent_counts[cone_idx] > 0 else 0
-                
-                # Normalise the POI count
-                for i in range(len(poi_counts)):
-                    poi_counts[i] /= len(self.pois)
-
-                # Normalise the agent count
-                for i in range(len(agent_counts)):
-                    agent_counts[i] /= len(rover_locations)
-
-                # Add counts to observations
-                if self.observation_mode == 'count':
-                    observation.extend(poi_counts)
-                    observation.extend(agent_counts)
-                elif self.observation_mode == 'density':
-                    observation.extend(poi_densities)
-                    observation.extend(agent_densities)
-            
-            else:
-                raise NotImplementedError("Observation generation is only implemented for 1D and 2D environments.")
-
-            observations_list.append(observation)
+    def validate_agent_config(self, agent_config):
+        """
+        Validate the Agents section of a rover config once, so that the episode loop can use the unchecked array kernels.
 
-        return observations_list
+        Parameters:
+        - agent_config (dict): The 'Agents' section with starting_locs, num_sensors, observation_radii and max_step_sizes.
+        """
+        starting_locs = agent_config['starting_locs']
+        num_agents = len(starting_locs)
+        validate_locations(starting_locs, len(self.dimensions))
+        for key in ['num_sensors', 'observation_radii', 'max_step_sizes']:
+            if not (isinstance(agent_config[key], list) and len(agent_config[key]) == num_agents):
+                raise ValueError(f"Agents {key} must be a list with one entry per starting location.")
+        self.validate_sensors(agent_config['num_sensors'], agent_config['observation_radii'])
+        if not all(isinstance(max_step, NUMBER_TYPES) and max_step >= 0 for max_step in agent_config['max_step_sizes']):
+            raise ValueError("Max step sizes must be non-negative numbers.")
+        if len(self.dimensions) == 2 and len(set(agent_config['num_sensors'])) != 1:
+            # NOTE: Rollouts stack the observations into arrays, and the policies' input size comes from num_sensors[0]
+            raise ValueError("Every rover must have the same number of sensors.")
+
+    def _check_rover_array(self, rover_locations, *per_rover_arrays):
+        """Full input checks for the array kernels, only run when debug_checks is enabled."""
+        if rover_locations.ndim < 2 or rover_locations.shape[-1] != len(self.dimensions):
+            raise ValueError(f"Rover locations must be a (..., num_rovers, {len(self.dimensions)}) array.")
+        if not np.all(rover_locations >= 0):
+            raise ValueError("All coordinates in each location must be numbers greater than zero.")
+        for per_rover_array in per_rover_arrays:
+            if per_rover_array.shape != rover_locations.shape[-2:-1] or not np.all(per_rover_array >= 0):
+                raise ValueError("Per-rover values must be non-negative with one entry per rover.")
 
     def get_ep_length(self):
         """
@@ -394,4 +691,4 @@ class MORoverEnv:
         return self.ep_length
     
     def get_dimensions(self):
-        return self.dimensions
\ No newline at end of file
+        return self.dimensions
@@ -1,8 +1,7 @@
-import yaml
-import torch
 import numpy as np
 
-from Policy import Policy
+import ConfigRegistry
+from Policy import Policy, PolicyBatch
 from MORoverEnv import MORoverEnv
 
 class MORoverInterface():
@@ -12,8 +11,9 @@ class MORoverInterface():
         Setup an internal reference to the rover config file
         """
         self.rover_env = MORoverEnv(rover_config_filename)
-        with open(rover_config_filename, 'r') as config_file:
-            self.config = yaml.safe_load(config_file)
+        self.config = ConfigRegistry.load_config(rover_config_filename) # Same parsed config as the env's
+        # Validate the agent setup once so that rollouts can step the unchecked array kernels
+        self.rover_env.validate_agent_config(self.config['Agents'])
     
     # to perform a key-wise sum of two dicts
     def _keywise_sum(self, dict1, dict2):
@@ -34,82 +34,167 @@ class MORoverInterface():
             raise ValueError("The supplied joint policy should be a list of Policy type objects")
 
         ep_length = self.rover_env.get_ep_length()
-        agent_locations = self.config['Agents']['starting_locs']  # set each agent to the starting location
+        agent_locations = np.array(self.config['Agents']['starting_locs'], dtype=float)  # set each agent to the starting location
         num_sensors = self.config['Agents']['num_sensors']
-        observation_radii = self.config['Agents']['observation_radii']
-        max_step_sizes = self.config['Agents']['max_step_sizes']
+        observation_radii = np.array(self.config['Agents']['observation_radii'], dtype=float)
+        max_step_sizes = np.array(self.config['Agents']['max_step_sizes'], dtype=float)
         
-        cumulative_global_reward = {}  # Initialize cumulative global reward
+        cumulative_global_reward = np.zeros(self.rover_env.num_objs)  # Initialize cumulative global reward
 
         rollout_trajectory = [[] for _ in range(len(joint_policy))] # List of list of dicts
 
+        # The whole team's policies, evaluated together at each step
+        team_policy = PolicyBatch(joint_policy)
+
         self.rover_env.reset() # reset the rover env
 
         for t in range(ep_length):
             # get each agent's observation at the current position
-            observations_list = self.rover_env.generate_observations(agent_locations, 
-                                                                     num_sensors, 
-                                                                     observation_radii, 
-                                                                     normalise=True) 
-            
-            joint_action = [] # Will store the combined joint action
+            observations = self.rover_env.generate_observations_array(agent_locations, 
+                                                                      num_sensors, 
+                                                                      observation_radii, 
+                                                                      normalise=True) 
+            observations_list = observations.tolist()
+            positions_list = agent_locations.tolist()
 
             # get each agent's move based on corresponding observation
-            for i, policy in enumerate(joint_policy):
-                # extract singe agent's observation
-                agent_observation = observations_list[i]
-                agent_observation_tensor = torch.FloatTensor(agent_observation)
-                # get policy output based on observation
-                action_tensor = policy.forward(agent_observation_tensor)
-                # Ensure actions are clipped to [-1, 1]
-                action_tensor = torch.clamp(action_tensor, -1.0, 1.0)
-                 # Convert to a numpy array without tracking gradient
-                action = action_tensor.squeeze(0).detach().numpy()
-
-                # Scale the action to comply with the agent's max step size
-                norm = np.linalg.norm(action) # get the magnitude of the calculated move
-                max_step = max_step_sizes[i]
-                scaling_factor = (max_step / norm) if norm > 0 else 0 # the factor by which the moves should be scaled
-                scaled_action = action * scaling_factor # multiply each member of the action by the scaling factor
-
-                # Add scaled action to the list of agent moves
-                joint_action.append(scaled_action)
+            actions = np.clip(team_policy.predict(observations), -1.0, 1.0) # Ensure actions are clipped to [-1, 1]
 
+            # Scale the actions to comply with the agents' max step sizes
+            norm = np.linalg.norm(actions, axis=-1, keepdims=True) # get the magnitude of the calculated moves
+            scaling_factor = np.divide(max_step_sizes[:, np.newaxis], norm, out=np.zeros(norm.shape), where=norm > 0)
+            joint_action = actions * scaling_factor # multiply each member of the action by the scaling factor
+
+            for i in range(len(joint_policy)):
                 # Add the agent's transition to the trajectory
                 rollout_trajectory[i].append(
                     {
-                        'state' : agent_observation,
-                        'action' : action,
-                        'position': agent_locations[i],  # Store the actual position
+                        'state' : observations_list[i],
+                        'action' : actions[i],
+                        'position': positions_list[i],  # Store the actual position
                     }
                 )
 
             # get updated agent positions based on the joint action
-            agent_locations = self.rover_env.update_agent_locations(agent_locations=agent_locations, 
-                                                                    agent_deltas=joint_action, 
-                                                                    max_step_sizes=max_step_sizes)
+            agent_locations = self.rover_env.update_agent_locations_array(agent_locations=agent_locations, 
+                                                                          agent_deltas=joint_action, 
+                                                                          max_step_sizes=max_step_sizes)
             
             # Get the global reward and update the cumulative global reward
-            global_reward = self.rover_env.get_global_rewards(rov_locations=agent_locations, timestep=t)
-            cumulative_global_reward = self._keywise_sum(cumulative_global_reward, global_reward)
+            cumulative_global_reward += self.rover_env.get_global_rewards_array(rov_locations=agent_locations, timestep=t)
+
+        return rollout_trajectory, dict(enumerate(cumulative_global_reward.tolist()))
+
+    def rollout_batch(self, joint_policies: list):
+        """
+        Perform rollouts of several joint policies in lockstep, one episode per joint policy.
+
+        Parameters:
+        - joint_policies: list of joint policies (each a list of policies representing a whole team)
+
+        Returns:
+        - rollouts (list): (rollout_trajectory, global_reward) for each joint policy, same as calling rollout on each one.
+        """
+        if not (isinstance(joint_policies, list) and all(isinstance(jp, list) and len(jp) == self.get_team_size() for jp in joint_policies)):
+            raise ValueError("The supplied joint policies should be a list of full-team lists of Policy type objects")
+
+        batch_size = len(joint_policies)
+        team_size = self.get_team_size()
+        ep_length = self.rover_env.get_ep_length()
+        starting_locs = np.array(self.config['Agents']['starting_locs'], dtype=float)
+        agent_locations = np.repeat(starting_locs[np.newaxis], batch_size, axis=0)  # batch_size x team_size x dims
+        num_sensors = self.config['Agents']['num_sensors']
+        observation_radii = np.array(self.config['Agents']['observation_radii'], dtype=float)
+        max_step_sizes = np.array(self.config['Agents']['max_step_sizes'], dtype=float)
 
-        return rollout_trajectory, cumulative_global_reward
+        cumulative_global_rewards = np.zeros((batch_size, self.rover_env.num_objs))  # Initialize cumulative global rewards
+
+        # Every policy of every team, evaluated together at each step
+        policy_batch = PolicyBatch([policy for joint_policy in joint_policies for policy in joint_policy])
+
+        # Per-timestep batch_size x team_size arrays, turned into trajectories at the end
+        states, actions, positions = [], [], []
+
+        self.rover_env.reset(batch_size=batch_size) # reset the rover env
+
+        for t in range(ep_length):
+            # get each agent's observation at the current position
+            observations = self.rover_env.generate_observations_array(agent_locations,
+                                                                      num_sensors,
+                                                                      observation_radii,
+                                                                      normalise=True)
+
+            # get every agent's move based on corresponding observation
+            action = np.clip(policy_batch.predict(observations.reshape(batch_size * team_size, -1)), -1.0, 1.0) # Ensure actions are clipped to [-1, 1]
+            action = action.reshape(batch_size, team_size, -1)
+
+            # Scale the actions to comply with the agents' max step sizes
+            norm = np.linalg.norm(action, axis=-1, keepdims=True) # get the magnitude of the calculated moves
+            scaling_factor = np.divide(max_step_sizes[:, np.newaxis], norm, out=np.zeros(norm.shape), where=norm > 0)
+            joint_action = action * scaling_factor
+
+            states.append(observations)
+            actions.append(action)
+            positions.append(agent_locations)
+
+            # get updated agent positions based on the joint actions
+            agent_locations = self.rover_env.update_agent_locations_array(agent_locations=agent_locations,
+                                                                          agent_deltas=joint_action,
+                                                                          max_step_sizes=max_step_sizes)
+
+            # Get the global rewards and update the cumulative global rewards
+            cumulative_global_rewards += self.rover_env.get_global_rewards_array(rov_locations=agent_locations, timestep=t)
+
+        # Unpack into the same per-individual trajectory format as rollout
+        rollouts = []
+        for b in range(batch_size):
+            rollout_trajectory = [[] for _ in range(team_size)] # List of list of dicts
+            for state, action, position in zip(states, actions, positions):
+                state_list, position_list = state[b].tolist(), position[b].tolist()
+                for i in range(team_size):
+                    rollout_trajectory[i].append(
+                        {
+                            'state' : state_list[i],
+                            'action' : action[b, i],
+                            'position': position_list[i],  # Store the actual position
+                        }
+                    )
+            rollouts.append((rollout_trajectory, dict(enumerate(cumulative_global_rewards[b].tolist()))))
+
+        return rollouts
 
     # Function that evaluates a given trajectory for global rewards (without rollout)
     def evaluate_trajectory(self, traj: dict):
+        num_dimensions = len(self.rover_env.dimensions)
         parsed_trajectory = [
-            [agent['position'] for agent in timestep]
+            np.array([agent['position'] for agent in timestep], dtype=float).reshape(len(timestep), num_dimensions)
             for timestep in zip(*traj)
-        ] # NOTE: this only works for 2-dimensional environments
+        ]
 
         self.rover_env.reset() # reset the rover env
 
-        cumulative_global_reward = {obj: 0 for obj in range(self.rover_env.num_objs)} # Initialize cumulative global reward
+        cumulative_global_reward = np.zeros(self.rover_env.num_objs) # Initialize cumulative global reward
         for t, agent_locations in enumerate(parsed_trajectory):
-            global_reward = self.rover_env.get_global_rewards(rov_locations=agent_locations, timestep=t)
-            cumulative_global_reward = self._keywise_sum(cumulative_global_reward, global_reward)
+            cumulative_global_reward += self.rover_env.get_global_rewards_array(rov_locations=agent_locations, timestep=t)
         
-        return cumulative_global_reward
+        return dict(enumerate(cumulative_global_reward.tolist()))
+
+    # Function that evaluates the trajectory once for every agent left out (without rollout)
+    def evaluate_counterfactuals(self, traj: list):
+        """
+        Global rewards of the trajectory with each agent's experience excluded in turn.
+
+        Parameters:
+        - traj (list): Full-team trajectory, as returned by rollout.
+
+        Returns:
+        - cf_rewards (list): Reward dict for each agent index, equal to evaluate_trajectory of the trajectory without that agent.
+        """
+        num_dimensions = len(self.rover_env.dimensions)
+        positions = np.array([[step['position'] for step in agent_traj] for agent_traj in traj], dtype=float).reshape(len(traj), -1, num_dimensions)
+
+        cf_rewards = self.rover_env.get_counterfactual_rewards_array(positions.transpose(1, 0, 2))
+        return [dict(enumerate(cf_reward)) for cf_reward in cf_rewards.tolist()]
 
     # Function to get domain-specific information for the algorithm
     def get_state_size(self):
@@ -1,12 +1,12 @@
 import random
-import pygmo as pg
 
 import Algorithm
 import Individual
+import Ranking
 
 class NSGAII_D(Algorithm.CoevolutionaryAlgorithm):
-    def __init__(self, alg_config_filename, domain_name, rover_config_filename, data_filename):
-        super().__init__(alg_config_filename, domain_name, rover_config_filename, data_filename)
+    def __init__(self, alg_config_filename, domain_name, rover_config_filename, data_filename, evaluator=None, num_workers=None):
+        super().__init__(alg_config_filename, domain_name, rover_config_filename, data_filename, evaluator, num_workers)
 
     def evolve(self, gen=0, traj_write_freq=100):
         print(gen)
@@ -16,12 +16,11 @@ class NSGAII_D(Algorithm.CoevolutionaryAlgorithm):
             random.shuffle(subpop)
         team_fitnesses = [] # To store the multibjective team fitness of each eval
         difference_evals = [[] for _ in range(self.team_size)] # To store the difference evals of each polcy (team_size*pop_size*num_objs)
-        # Perform rollout and assign fitness to each team
-        for eval_idx in range(self.pop_size):
-            # Pick policies at the eval_index across all subpopulations
-            team_policy = [self.pop[i][eval_idx] for i in range(len(self.pop))]
-            # Condcut rollout
-            trajectory, fitness_dict = self.interface.rollout(team_policy)
+        # Pick policies at each eval_index across all subpopulations
+        team_policies = [[self.pop[i][eval_idx] for i in range(len(self.pop))] for eval_idx in range(self.pop_size)]
+        # Perform rollout and counterfactual evals of each team, then assign fitness to each team
+        rollouts = self.rollout_joint_policies(team_policies, counterfactuals=True)
+        for team_policy, (trajectory, fitness_dict, cf_fitness_dicts) in zip(team_policies, rollouts):
             self.glob_eval_counter += 1
             if len(fitness_dict) != self.num_objs:
                 raise ValueError(f"[NSGA-II+D] Expected {self.num_objs} objectives, but got {len(fitness_dict)}.")
@@ -42,9 +41,8 @@ class NSGAII_D(Algorithm.CoevolutionaryAlgorithm):
 
             # Counterfactual eval of each policy in this team policy
             for p_idx in range(len(team_policy)):
-                # Trajectory with this policy's experience excluded
-                cf_traj = [trajectory[i] for i in range(len(team_policy)) if i != p_idx]
-                cf_fitness_dict = self.interface.evaluate_trajectory(cf_traj)
+                # Fitness of the trajectory with this policy's experience excluded
+                cf_fitness_dict = cf_fitness_dicts[p_idx]
                 for f in cf_fitness_dict:
                     cf_fitness_dict[f] = -cf_fitness_dict[f] # NOTE: The fitness sign is flipped to match Pygmo convention
                 # Difference evalutions per-objective for this policy
@@ -52,31 +50,34 @@ class NSGAII_D(Algorithm.CoevolutionaryAlgorithm):
                 policy_d_vals = [fitness_dict[o] - cf_fitness_dict[o] for o in objectives]
                 # Append to corresponding subpop d values
                 difference_evals[p_idx].append(policy_d_vals)
+        self.data_logger.end_generation() # All of this generation's rows are logged
                 
         # Sort each subpop according to nsgaII sorting of difference evaluations
         for subpop_idx, subpop_d_vals in enumerate(difference_evals):
-            sorted_indices = pg.sort_population_mo(points=[d_vals for d_vals in subpop_d_vals])
+            sorted_indices = Ranking.sort_population(subpop_d_vals)
             # Arrange the policies in subpop according to this sorted order
             sorted_subpop = []
             for policy_idx in sorted_indices:
                 sorted_subpop.append(self.pop[subpop_idx][policy_idx])
+            if self.store is None:
+                # The discarded policies become buffers for this generation's offspring
+                self.utils.recycle(sorted_subpop[self.pop_size // 2:])
             sorted_subpop = sorted_subpop[: self.pop_size // 2]
             # Keep only the top half of each subpop
             self.pop[subpop_idx] = sorted_subpop
 
-        # Offspring creation in each subpop
+        # Pick parent pairs in each subpop via binary tournament until the offspring fill it up to the pop_size
+        parent_pairs = []
         for subpop_idx, subpop in enumerate(self.pop):
-            offspring_set = []
-            # Fill up the offspring set to the pop_size via offspring-creation
-            while len(subpop) + len(offspring_set) < self.pop_size:
+            subpop_pairs = []
+            while len(subpop) + 2 * len(subpop_pairs) < self.pop_size:
                 idx1, idx2 = random.sample(range(len(subpop)), 2)
                 parent1 = subpop[min(idx1, idx2)] # choose the lower (more fit) option
                 idx1, idx2 = random.sample(range(len(subpop)), 2)
                 parent2 = subpop[min(idx1, idx2)] # choose the lower (more fit) option
-                # Crossover the parent policies using SBX to get two offspring
-                offspring1, offspring2 = self.utils.SBX(parent1, parent2)
-                # Mutate the offsprings by adding noise
-                offspring1.mutate()
-                offspring2.mutate()
-                offspring_set.extend([offspring1, offspring2])
-            self.pop[subpop_idx].extend(offspring_set)
\ No newline at end of file
+                subpop_pairs.append((parent1, parent2))
+            parent_pairs.append(subpop_pairs)
+
+        # Offspring creation in each subpop: SBX of the parent policies, then mutation by adding noise
+        for subpop_idx, offspring_set in enumerate(self.create_offspring(parent_pairs)):
+            self.pop[subpop_idx].extend(offspring_set)
@@ -1,11 +1,20 @@
-import yaml
+import numpy as np
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+import ConfigRegistry
+
+INFERENCE_BACKENDS = ('torch', 'numpy')
+
+class _UninitialisedLinear(nn.Linear):
+    """Linear layer whose parameters are allocated but not initialised, so constructing it draws no random numbers."""
+    def reset_parameters(self):
+        pass
+
 class Policy(nn.Module):
-    def __init__(self, config_filename, input_size=10, output_size=2):
+    def __init__(self, config_filename, input_size=10, output_size=2, init_parameters=True):
         """
         Initializes the policy network.
 
@@ -13,6 +22,8 @@ class Policy(nn.Module):
         - input_size (int): Number of input features.
         - output_size (int): Number of output actions.
         - hidden_layers (list of int): List with the number of neurons in each hidden layer.
+        - init_parameters (bool): Randomly initialise the parameters. If False they are left uninitialised
+          (and no random numbers are drawn), for buffers that the caller overwrites.
         """
         self.config_filename = config_filename
         self._read_config()
@@ -25,16 +36,19 @@ class Policy(nn.Module):
         layer_sizes = [input_size] + self.hidden_layers + [output_size]
         self.layers = nn.ModuleList()
         for i in range(len(layer_sizes) - 1):
-            self.layers.append(nn.Linear(layer_sizes[i], layer_sizes[i+1]))
+            if init_parameters:
+                self.layers.append(nn.Linear(layer_sizes[i], layer_sizes[i+1]))
+            else:
+                self.layers.append(_UninitialisedLinear(layer_sizes[i], layer_sizes[i+1]))
 
         # Initialize weights and biases with small random values
-        self.reset_parameters()
+        if init_parameters:
+            self.reset_parameters()
     
     def _read_config(self):
         """Read and load Policy configuration from the YAML file."""
-        with open(self.config_filename, 'r') as config_file:
-            self.config_data = yaml.safe_load(config_file)
-            # print('[Policy]: YAML config read.')
+        self.config_data = ConfigRegistry.load_config(self.config_filename) # Parsed once per process and shared by every Policy
+        # print('[Policy]: YAML config read.')
 
         self._load_config()
     
@@ -46,6 +60,10 @@ class Policy(nn.Module):
         self.mutation_scale = self.config_data['Policy']['mutation_scale']
         self.weight_init_lim = self.config_data['Policy']['weight_init_lim']
         self.bias_init_lim = self.config_data['Policy']['bias_init_lim']
+        # Library that runs rollout inference, torch is always used for the parameters themselves
+        self.inference_backend = self.config_data['Policy'].get('inference_backend', 'torch')
+        if self.inference_backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend '{self.inference_backend}', expected one of {INFERENCE_BACKENDS}.")
 
     def reset_parameters(self):
         for layer in self.layers:
@@ -73,6 +91,16 @@ class Policy(nn.Module):
                     x = torch.softmax(x, dim=0) # Output layer activation to get probability distribution over actions
         return x
 
+    def export_numpy(self):
+        """
+        Copy the network's parameters out to plain NumPy arrays, for inference without torch.
+
+        Returns:
+        - layers (list): (weight, bias) per layer, weight is an in_features x out_features float32 array and bias an out_features one.
+        """
+        with torch.no_grad():
+            return [(layer.weight.numpy().T.copy(), layer.bias.numpy().copy()) for layer in self.layers]
+
     def mutate(self):
         """
         Applies mutations to the network's parameters.
@@ -89,3 +117,92 @@ class Policy(nn.Module):
                 mutations = torch.empty_like(param).uniform_(-self.mutation_scale, self.mutation_scale)
                 # Apply mutations
                 param.add_(mutation_mask * mutations)
+
+class PolicyBatch:
+    def __init__(self, policies, backend=None):
+        """
+        Stacks the parameters of several policies so that all of them can be evaluated with one batched matmul per layer.
+
+        Parameters:
+        - policies (list): Policy instances that share the same layer sizes.
+        - backend (str, optional): 'torch' or 'numpy'. Defaults to the inference_backend of the policies' config.
+        """
+        self.backend = backend if backend is not None else policies[0].inference_backend
+        if self.backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend '{self.backend}', expected one of {INFERENCE_BACKENDS}.")
+
+        num_layers = len(policies[0].layers)
+        if self.backend == 'numpy':
+            exported = [p.export_numpy() for p in policies]
+            # weights[i] is num_policies x in_features x out_features, biases[i] is num_policies x 1 x out_features
+            self.weights = [np.stack([layers[i][0] for layers in exported]) for i in range(num_layers)]
+            self.biases = [np.stack([layers[i][1] for layers in exported])[:, np.newaxis, :] for i in range(num_layers)]
+            return
+        with torch.no_grad():
+            # weights[i] is num_policies x in_features x out_features, biases[i] is num_policies x 1 x out_features
+            self.weights = [torch.stack([p.layers[i].weight for p in policies]).transpose(1, 2) for i in range(num_layers)]
+            self.biases = [torch.stack([p.layers[i].bias for p in policies]).unsqueeze(1) for i in range(num_layers)]
+
+    def forward(self, x, final_activation="tanh"):
+        """
+        Forward pass through every stacked policy.
+
+        Parameters:
+        - x (torch.Tensor or np.ndarray): Input of shape (num_policies, input_size), row i is the input of policy i.
+          A float32 tensor for the torch backend, a float32 array for the numpy backend.
+
+        Returns:
+        - torch.Tensor or np.ndarray: Output of shape (num_policies, output_size), same type as the input.
+        """
+        if self.backend == 'numpy':
+            x = x[:, np.newaxis, :]
+            for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+                x = np.matmul(x, weight) + bias
+                if i < len(self.weights) - 1:
+                    x = np.tanh(x)  # Hidden layers activation
+                else:
+                    if final_activation=="tanh":
+                        x = np.tanh(x)  # Output layer activation to constrain outputs to [-1, +1]
+                    elif final_activation=="softmax":
+                        x = np.exp(x - x.max(axis=-1, keepdims=True)) # Output layer activation to get probability distribution over actions
+                        x /= x.sum(axis=-1, keepdims=True)
+            return x[:, 0, :]
+
+        with torch.no_grad():
+            x = x.unsqueeze(1)
+            for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+                x = torch.baddbmm(bias, x, weight)
+                if i < len(self.weights) - 1:
+                    x = torch.tanh(x)  # Hidden layers activation
+                else:
+                    if final_activation=="tanh":
+                        x = torch.tanh(x)  # Output layer activation to constrain outputs to [-1, +1]
+                    elif final_activation=="softmax":
+                        x = torch.softmax(x, dim=-1) # Output layer activation to get probability distribution over actions
+            return x.squeeze(1)
+
+    def predict(self, observations, final_activation="tanh"):
+        """
+        Outputs of every stacked policy for NumPy observations, whatever the backend.
+
+        Parameters:
+        - observations (np.ndarray): Array of shape (num_policies, input_size), row i is the observation of policy i.
+
+        Returns:
+        - np.ndarray: float32 array of shape (num_policies, output_size).
+        """
+        if self.backend == 'numpy':
+            return self.forward(np.asarray(observations, dtype=np.float32), final_activation=final_activation)
+        return self.forward(torch.as_tensor(observations, dtype=torch.float32), final_activation=final_activation).numpy()
+
+    def greedy_actions(self, observations):
+        """
+        Index of the most probable action of every stacked policy, for discrete-action (softmax head) domains.
+
+        Parameters:
+        - observations (np.ndarray): Array of shape (num_policies, input_size), row i is the observation of policy i.
+
+        Returns:
+        - np.ndarray: Integer array of shape (num_policies,), the argmax of each policy's softmax output.
+        """
+        return np.argmax(self.predict(observations, final_activation="softmax"), axis=-1)
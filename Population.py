@@ -0,0 +1,154 @@
+import random
+
+import numpy
+
+import Ranking
+
+class Population:
+    def __init__(self, num_objs, num_agents, capacity):
+        """
+        The individuals of a centralised algorithm, with their fitness and metadata in preallocated columns, one row per
+        individual. Individuals in the population are views of their row, so sorting, selection and logging can work on
+        slices of the columns. Rows are reused as individuals leave and join, and the columns grow when they are full.
+
+        Columns:
+        - ids (np.ndarray): Individual ids.
+        - fitness (np.ndarray): rows x num_objs fitnesses, minimised (Pygmo convention).
+        - evaluated (np.ndarray): Whether the row's fitness and trajectory are valid.
+        - trajectories (list): Trajectory of each row's last rollout.
+        - cf_fitnesses (list): Per-policy counterfactual fitnesses of each row's trajectory, filled in on first use.
+        - ranks (np.ndarray): Non-domination rank from the last sort.
+        - crowding (np.ndarray): Crowding distance within its front from the last sort.
+        - credit (np.ndarray): rows x num_agents credit of each policy (e.g. DMO values).
+
+        Parameters:
+        - num_objs (int): Number of objectives.
+        - num_agents (int): Number of policies in a joint policy.
+        - capacity (int): Initial number of rows.
+        """
+        self.num_objs = num_objs
+        self.num_agents = num_agents
+        self.capacity = 0
+        self.ids = numpy.zeros(0, dtype=numpy.int64)
+        self.fitness = numpy.zeros((0, num_objs))
+        self.evaluated = numpy.zeros(0, dtype=bool)
+        self.trajectories = []
+        self.cf_fitnesses = []
+        self.ranks = numpy.zeros(0, dtype=numpy.int64)
+        self.crowding = numpy.zeros(0)
+        self.credit = numpy.zeros((0, num_agents))
+        self.free_rows = []
+        self.members = [] # Individuals in population order
+        self._grow(capacity)
+
+    def __len__(self):
+        return len(self.members)
+
+    def __iter__(self):
+        return iter(self.members)
+
+    def __getitem__(self, index):
+        return self.members[index]
+
+    def _grow(self, capacity):
+        """Extend the columns to the given number of rows."""
+        extra = capacity - self.capacity
+        self.ids = numpy.concatenate([self.ids, numpy.full(extra, -1, dtype=numpy.int64)])
+        self.fitness = numpy.concatenate([self.fitness, numpy.full((extra, self.num_objs), -1.0)])
+        self.evaluated = numpy.concatenate([self.evaluated, numpy.zeros(extra, dtype=bool)])
+        self.trajectories.extend([None] * extra)
+        self.cf_fitnesses.extend([None] * extra)
+        self.ranks = numpy.concatenate([self.ranks, numpy.zeros(extra, dtype=numpy.int64)])
+        self.crowding = numpy.concatenate([self.crowding, numpy.zeros(extra)])
+        self.credit = numpy.concatenate([self.credit, numpy.zeros((extra, self.num_agents))])
+        # Lowest rows are handed out first
+        self.free_rows = list(range(capacity - 1, self.capacity - 1, -1)) + self.free_rows
+        self.capacity = capacity
+
+    def _attach(self, ind):
+        """Move an individual's fields into a free row, and make it a view of that row."""
+        if ind.population is not None:
+            raise ValueError(f"Individual {ind.id} already belongs to a population.")
+        if not self.free_rows:
+            self._grow(max(1, 2 * self.capacity))
+        row = self.free_rows.pop()
+        fields = ind.detached_fields()
+        self.ids[row] = fields['id']
+        self.fitness[row] = fields['fitness']
+        self.evaluated[row] = fields['evaluated']
+        self.trajectories[row] = fields['trajectory']
+        self.cf_fitnesses[row] = fields['cf_fitnesses']
+        ind.bind(self, row)
+
+    def _detach(self, ind):
+        """Give an individual leaving the population its own copy of its fields, and free its row."""
+        row = ind.row
+        ind.unbind(id=int(self.ids[row]),
+                   fitness=self.fitness[row].copy(),
+                   evaluated=bool(self.evaluated[row]),
+                   trajectory=self.trajectories[row],
+                   cf_fitnesses=self.cf_fitnesses[row])
+        self.trajectories[row] = None
+        self.cf_fitnesses[row] = None
+        self.free_rows.append(row)
+
+    def add(self, ind):
+        """Append an individual to the population."""
+        self._attach(ind)
+        self.members.append(ind)
+
+    def remove(self, ind):
+        """Take an individual out of the population. It keeps its fields."""
+        self.members.remove(ind)
+        self._detach(ind)
+
+    def set_members(self, inds):
+        """
+        Make the given individuals the population, in this order. Members that are not among them leave the
+        population, and the others join it.
+
+        Parameters:
+        - inds (list): Individuals, current members or not.
+        """
+        staying = set(id(ind) for ind in inds)
+        for ind in self.members:
+            if id(ind) not in staying:
+                self._detach(ind)
+        for ind in inds:
+            if ind.population is not self:
+                self._attach(ind)
+        self.members = list(inds)
+
+    def shuffle(self):
+        """Shuffle the population order with Python's random module."""
+        random.shuffle(self.members)
+
+    def rows(self, inds=None):
+        """
+        Rows of the given members, or of the whole population.
+
+        Returns:
+        - rows (np.ndarray): Row of each individual, to index the columns with.
+        """
+        return numpy.fromiter((ind.row for ind in (self.members if inds is None else inds)), dtype=numpy.int64)
+
+    def sort(self, inds=None):
+        """
+        Sort members by non-domination rank and crowding distance, as Ranking.sort_population, and store their ranks
+        and crowding distances in the columns.
+
+        Parameters:
+        - inds (list, optional): Evaluated members to sort. Defaults to the whole population.
+
+        Returns:
+        - sorted_indices (np.ndarray): Positions in inds (or in the population) from best to worst.
+        """
+        rows = self.rows(inds)
+        points = self.fitness[rows]
+        if len(rows) < 2:
+            return numpy.arange(len(rows))
+        ranks = Ranking.non_dominated_ranks(points)
+        distances = Ranking.front_crowding_distances(points, ranks)
+        self.ranks[rows] = ranks
+        self.crowding[rows] = distances
+        return Ranking.sort_population(points, ranks, distances)
@@ -0,0 +1,179 @@
+import copy
+from multiprocessing import shared_memory
+
+import numpy as np
+import torch
+
+class PopulationStore:
+    def __init__(self, capacity, num_agents, template_policy, shared=False):
+        """
+        Contiguous storage for the parameters of every policy in a population, so that variation operators run as
+        single tensor operations over all offspring instead of per-module Python loops and deep copies.
+
+        Parameters are kept in one capacity x num_agents x num_params tensor. Each (row, agent) slot owns a persistent
+        Policy whose layer weights and biases are views into that tensor, so writing a row re-parameterises its policies.
+
+        Parameters:
+        - capacity (int): Number of rows (joint policies, or policies per subpopulation) that can be held at once.
+        - num_agents (int): Number of policies per row (team size).
+        - template_policy (Policy): Policy with the layer sizes and mutation settings shared by every slot.
+        - shared (bool): Allocate the parameter tensor in a shared memory block, so that worker processes can read
+          the policies in place by (row, agent) instead of receiving copies of them.
+        """
+        self.capacity = capacity
+        self.num_agents = num_agents
+        self.num_params = sum(param.numel() for param in template_policy.parameters())
+        self.mutation_rate = template_policy.mutation_rate
+        self.mutation_scale = template_policy.mutation_scale
+
+        self.shared_memory = None
+        self.unlinked = False
+        if shared:
+            # NOTE: float32, the dtype of the policies' parameters
+            self.shared_memory = shared_memory.SharedMemory(create=True, size=capacity * num_agents * self.num_params * 4)
+            self.params = torch.from_numpy(np.ndarray((capacity, num_agents, self.num_params), dtype=np.float32, buffer=self.shared_memory.buf))
+            self.params.zero_()
+        else:
+            self.params = torch.zeros(capacity, num_agents, self.num_params)
+        # policies[row][agent] is the Policy viewing that slot, copies of the template until a policy is bound to it
+        self.policies = [[None for _ in range(num_agents)] for _ in range(capacity)]
+        for row in range(capacity):
+            for agent in range(num_agents):
+                self.bind(row, agent, copy.deepcopy(template_policy))
+
+    def shared_block(self):
+        """
+        Where worker processes find the parameters of a shared store.
+
+        Returns:
+        - (name, shape): Name of the shared memory block and the capacity x num_agents x num_params shape of the float32 array in it.
+        """
+        if self.shared_memory is None:
+            raise ValueError("The population store was not allocated in shared memory.")
+        return self.shared_memory.name, tuple(self.params.shape)
+
+    def close(self):
+        """Release the shared memory block, if any. The store must not be used afterwards."""
+        if self.shared_memory is not None and not self.unlinked:
+            self.shared_memory.unlink()
+            self.unlinked = True
+            # NOTE: Policies bound to the store may still view the block, then it is unmapped when the process exits
+            try:
+                self.shared_memory.close()
+            except BufferError:
+                pass
+
+    def bind(self, row, agent, policy):
+        """
+        Move a policy's parameters into a slot of the store, and make its layers views of that slot.
+
+        Parameters:
+        - row (int): Row of the slot.
+        - agent (int): Agent index of the slot.
+        - policy (Policy): Policy to bind. Its current parameter values are kept.
+        """
+        offset = 0
+        with torch.no_grad():
+            for param in policy.parameters():
+                view = self.params[row, agent, offset:offset + param.numel()].view_as(param)
+                view.copy_(param.data)
+                param.data = view
+                offset += param.numel()
+        policy.store_row = row
+        self.policies[row][agent] = policy
+
+    def bind_joint_policy(self, row, joint_policy):
+        """Bind every policy of a joint policy to one row of the store."""
+        for agent, policy in enumerate(joint_policy):
+            self.bind(row, agent, policy)
+
+    def free_rows(self, used_policies):
+        """
+        Rows not holding any of the given policies, per agent.
+
+        Parameters:
+        - used_policies (list): For each agent, the store-bound policies that must not be overwritten.
+
+        Returns:
+        - free_rows (list): For each agent, the sorted list of rows free in that agent's column.
+        """
+        free_rows = []
+        for agent in range(self.num_agents):
+            used = {policy.store_row for policy in used_policies[agent]}
+            free_rows.append([row for row in range(self.capacity) if row not in used])
+        return free_rows
+
+    def crossover(self, parent_rows1, parent_rows2, dest_rows1, dest_rows2, eta=15):
+        """
+        Simulated Binary Crossover (SBX) of many parent pairs at once, written straight into the destination slots.
+
+        Parameters:
+        - parent_rows1 (torch.Tensor): num_pairs x num_agents rows of the first parent of each pair, per agent.
+        - parent_rows2 (torch.Tensor): num_pairs x num_agents rows of the second parent of each pair, per agent.
+        - dest_rows1 (torch.Tensor): num_pairs x num_agents rows to write the first offspring of each pair to.
+        - dest_rows2 (torch.Tensor): num_pairs x num_agents rows to write the second offspring of each pair to.
+        - eta (int, optional): Distribution index controlling the spread of offspring. Default is 15.
+        """
+        agents = torch.arange(self.num_agents)
+        with torch.no_grad():
+            p1 = self.params[parent_rows1, agents]
+            p2 = self.params[parent_rows2, agents]
+
+            # Generate random numbers u between 0 and 1
+            u = torch.rand_like(p1)
+
+            # Compute beta_q using the SBX formula
+            beta_q = torch.where(
+                u <= 0.5,
+                (2 * u) ** (1.0 / (eta + 1)),
+                (1 / (2 * (1 - u))) ** (1.0 / (eta + 1)),
+            )
+
+            # Generate offspring parameters
+            self.params[dest_rows1, agents] = 0.5 * ((1 + beta_q) * p1 + (1 - beta_q) * p2)
+            self.params[dest_rows2, agents] = 0.5 * ((1 - beta_q) * p1 + (1 + beta_q) * p2)
+
+    def mutate(self, rows):
+        """
+        Mutate the policies in many slots at once, with the same operator as Policy.mutate.
+
+        Parameters:
+        - rows (torch.Tensor): num_rows x num_agents rows to mutate, per agent.
+        """
+        agents = torch.arange(self.num_agents)
+        with torch.no_grad():
+            block = self.params[rows, agents]
+            # Generate a mask for which parameters to mutate
+            mutation_mask = torch.rand_like(block) < self.mutation_rate
+            # Generate random mutations
+            mutations = torch.empty_like(block).uniform_(-self.mutation_scale, self.mutation_scale)
+            # Apply mutations
+            self.params[rows, agents] = block + mutation_mask * mutations
+
+    def create_offspring(self, used_policies, parent_policies1, parent_policies2):
+        """
+        Cross over and mutate a batch of parent pairs into free slots of the store.
+
+        Parameters:
+        - used_policies (list): For each agent, the store-bound policies that must survive (e.g. the parent set).
+        - parent_policies1 (list): num_pairs lists with the first parent policy of the pair for each agent.
+        - parent_policies2 (list): num_pairs lists with the second parent policy of the pair for each agent.
+
+        Returns:
+        - offspring (list): 2 * num_pairs lists with the offspring policy for each agent, pair by pair.
+        """
+        num_pairs = len(parent_policies1)
+        if num_pairs == 0:
+            return []
+        free_rows = self.free_rows(used_policies)
+        if any(len(rows) < 2 * num_pairs for rows in free_rows):
+            raise ValueError("The population store does not have enough free rows for the offspring.")
+
+        parent_rows1 = torch.tensor([[policy.store_row for policy in policies] for policies in parent_policies1])
+        parent_rows2 = torch.tensor([[policy.store_row for policy in policies] for policies in parent_policies2])
+        dest_rows = torch.tensor(free_rows)[:, :2 * num_pairs].T.reshape(num_pairs, 2, self.num_agents)
+
+        self.crossover(parent_rows1, parent_rows2, dest_rows[:, 0], dest_rows[:, 1])
+        self.mutate(dest_rows.reshape(2 * num_pairs, self.num_agents))
+
+        return [[self.policies[row][agent] for agent, row in enumerate(rows)] for rows in dest_rows.reshape(2 * num_pairs, self.num_agents).tolist()]
@@ -0,0 +1,193 @@
+import bisect
+
+import numpy as np
+import pygmo as pg
+
+# NOTE: Everything here minimises, like Pygmo. Ranks, and so the members of each front, are the same as
+# pg.fast_non_dominated_sorting gives, for 2 and 3 objectives with sweeps in O(N log N) instead of the generic O(M N^2),
+# and with Pygmo otherwise
+
+def _ranks_2d(points):
+    # Sweep in lexicographic order: a point can only be dominated by points before it. Each front is summarised by
+    # (min f2, f1 of that point), which grows with the front index, so a point's front is found by bisection
+    order = np.lexsort((points[:, 1], points[:, 0]))
+    ranks = np.empty(len(points), dtype=int)
+    keys = []
+    for i, (f1, f2) in zip(order.tolist(), points[order].tolist()):
+        # Front k dominates the point iff keys[k] < (f2, f1): a smaller f2, or the same f2 with a smaller f1
+        rank = bisect.bisect_left(keys, (f2, f1))
+        if rank == len(keys):
+            keys.append((f2, f1))
+        else:
+            keys[rank] = (f2, f1)
+        ranks[i] = rank
+    return ranks
+
+def _ranks_3d(points):
+    # Sweep in lexicographic order, keeping for each front the staircase of its members' (f2, f3): f2 increasing,
+    # f3 decreasing. The member with the smallest f3 among those with f2 <= the point's f2 decides domination
+    order = np.lexsort((points[:, 2], points[:, 1], points[:, 0]))
+    ranks = np.empty(len(points), dtype=int)
+    staircases = [] # (f2 list, f3 list, f1 list) per front
+
+    def dominated(staircase, f1, f2, f3):
+        s2, s3, s1 = staircase
+        j = bisect.bisect_right(s2, f2) - 1
+        if j < 0:
+            return False
+        # An equal f3 only dominates with a better f2 or f1, identical points do not dominate each other
+        return s3[j] < f3 or (s3[j] == f3 and (s2[j] < f2 or s1[j] < f1))
+
+    for i, (f1, f2, f3) in zip(order.tolist(), points[order].tolist()):
+        # The fronts dominating the point come first
+        lo, hi = 0, len(staircases)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if dominated(staircases[mid], f1, f2, f3):
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(staircases):
+            staircases.append(([f2], [f3], [f1]))
+        else:
+            s2, s3, s1 = staircases[lo]
+            # Drop the members the point dominates in (f2, f3), they can no longer decide anything
+            start = bisect.bisect_left(s2, f2)
+            end = start
+            while end < len(s2) and s3[end] >= f3:
+                end += 1
+            s2[start:end] = [f2]
+            s3[start:end] = [f3]
+            s1[start:end] = [f1]
+        ranks[i] = lo
+    return ranks
+
+def non_dominated_ranks(points):
+    """
+    Non-domination rank of each point: 0 for the non-dominated front, k for the points dominated only by fronts 0..k-1.
+
+    Parameters:
+    - points (array-like): N x M fitnesses, minimised.
+
+    Returns:
+    - ranks (np.ndarray): N integer ranks.
+    """
+    points = np.asarray(points, dtype=float)
+    if len(points) == 0:
+        return np.zeros(0, dtype=int)
+    if points.shape[1] == 2:
+        return _ranks_2d(points)
+    if points.shape[1] == 3:
+        return _ranks_3d(points)
+    if len(points) == 1:
+        return np.zeros(1, dtype=int)
+    _, _, _, ranks = pg.fast_non_dominated_sorting(points=points)
+    return np.asarray(ranks, dtype=int)
+
+def non_dominated_fronts(points, ranks=None):
+    """
+    Non-dominated fronts, like the first element of pg.fast_non_dominated_sorting.
+
+    Parameters:
+    - points (array-like): N x M fitnesses, minimised.
+    - ranks (np.ndarray, optional): Their non_dominated_ranks, if already known.
+
+    Returns:
+    - fronts (list): Index array of each front, best first, with the indices of a front in increasing order.
+    """
+    if ranks is None:
+        ranks = non_dominated_ranks(points)
+    if len(ranks) == 0:
+        return []
+    order = np.argsort(ranks, kind='stable')
+    return np.split(order, np.cumsum(np.bincount(ranks))[:-1])
+
+def front_crowding_distances(points, ranks):
+    """
+    Crowding distance of every point within its own front, for all fronts at once. The points of a front of one or two
+    points are all boundary points, with infinite distances.
+
+    Parameters:
+    - points (array-like): N x M fitnesses, minimised.
+    - ranks (np.ndarray): Their non_dominated_ranks.
+
+    Returns:
+    - distances (np.ndarray): N crowding distances.
+    """
+    points = np.asarray(points, dtype=float)
+    num_points = len(points)
+    distances = np.zeros(num_points)
+    # NOTE: Each objective's sort is stable and starts from the order of the previous one, with every front starting in
+    # increasing index order. Pygmo starts from its own front order, so with tied objective values it may pick a
+    # different tied point as a front's (infinite) boundary
+    order = np.argsort(ranks, kind='stable')
+    sorted_ranks = ranks[order]
+    first = np.r_[True, sorted_ranks[1:] != sorted_ranks[:-1]]
+    last = np.r_[sorted_ranks[1:] != sorted_ranks[:-1], True]
+    boundary = first | last
+    front_sizes = np.diff(np.r_[np.flatnonzero(first), num_points])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for obj in range(points.shape[1]):
+            order = order[np.lexsort((points[order, obj], sorted_ranks))]
+            values = points[order, obj]
+            spans = np.repeat(values[last] - values[first], front_sizes)
+            gaps = np.r_[0.0, values[2:] - values[:-2], 0.0]
+            distances[order[~boundary]] += (gaps / spans)[~boundary]
+            distances[order[boundary]] = np.inf
+    return distances
+
+def crowding_distance(points):
+    """
+    NSGA-II crowding distance of each point of a front, with the same conventions as pg.crowding_distance: boundary
+    points are infinite, and an objective that is equal across the front gives NaN to its interior points.
+
+    Parameters:
+    - points (array-like): N x M fitnesses of the points of one front, N >= 2.
+
+    Returns:
+    - distances (np.ndarray): N crowding distances.
+    """
+    points = np.asarray(points, dtype=float)
+    if len(points) < 2:
+        raise ValueError(f"The crowding distance needs at least two points, got {len(points)}.")
+    return front_crowding_distances(points, np.zeros(len(points), dtype=int))
+
+def sort_population(points, ranks=None, distances=None):
+    """
+    Indices of the points from best to worst, by non-domination rank and then by decreasing crowding distance within a
+    front (NaN distances first, as in Pygmo). The replacement for pg.sort_population_mo.
+
+    NOTE: Ranks are the same as Pygmo's, but the order is not guaranteed to be. With tied objective values, a front's
+    boundary points may be chosen differently from Pygmo's, and points with equal rank and crowding distance keep their
+    index order, where Pygmo's order is unspecified
+
+    Parameters:
+    - points (array-like): N x M fitnesses, minimised.
+    - ranks (np.ndarray, optional): Their non_dominated_ranks, if already known.
+    - distances (np.ndarray, optional): Their front_crowding_distances, if already known.
+
+    Returns:
+    - sorted_indices (np.ndarray): N indices.
+    """
+    points = np.asarray(points, dtype=float)
+    if len(points) < 2:
+        return np.arange(len(points))
+    if ranks is None:
+        ranks = non_dominated_ranks(points)
+    if distances is None:
+        distances = front_crowding_distances(points, ranks)
+    # NaN sorts before every number, infinity included
+    return np.lexsort((-np.nan_to_num(distances, nan=np.inf), ~np.isnan(distances), ranks))
+
+def non_dominated(points):
+    """
+    Indices of the non-dominated points, in increasing order.
+
+    Parameters:
+    - points (array-like): N x M fitnesses, minimised.
+
+    Returns:
+    - indices (np.ndarray): Indices of the first front.
+    """
+    ranks = non_dominated_ranks(points)
+    return np.flatnonzero(ranks == 0)
@@ -0,0 +1,112 @@
+import numpy as np
+
+class UniformGrid:
+    def __init__(self, dimensions, cell_size):
+        """
+        Uniform grid over the environment, used to find the points near a location without scanning every point.
+
+        Parameters:
+        - dimensions (list): Size of the environment along each axis.
+        - cell_size (float or int): Side length of each grid cell (must be > 0).
+        """
+        if not cell_size > 0:
+            raise ValueError('Grid cell size must be a positive number.')
+
+        self.cell_size = float(cell_size)
+        self.num_dimensions = len(dimensions)
+        # Locations on the upper boundary get a cell of their own
+        self.grid_shape = np.floor(np.asarray(dimensions, dtype=float) / self.cell_size).astype(int) + 1
+        self.num_cells = int(np.prod(self.grid_shape))
+        # Row-major strides to turn cell coordinates into a flat cell id
+        self._strides = np.array([int(np.prod(self.grid_shape[i+1:])) for i in range(self.num_dimensions)], dtype=int)
+
+    def cell_coords(self, points):
+        """Integer cell coordinates of each point (N x dims). Points outside the environment are clamped to the border cells."""
+        return np.clip(np.floor(points / self.cell_size).astype(int), 0, self.grid_shape - 1)
+
+    def cell_ids(self, points):
+        """Flat cell id of each point (N x dims)."""
+        return self.cell_coords(points) @ self._strides
+
+    def cell_list(self, points, groups=None, num_groups=1):
+        """
+        Bucket points by the cell they fall in.
+
+        Parameters:
+        - points (np.ndarray): N x dims array of locations.
+        - groups (np.ndarray): Optional group (e.g. episode) of each point. Points of different groups never share a bucket.
+        - num_groups (int): Number of groups.
+
+        Returns:
+        - cell_list (tuple): (order, starts) where order[starts[k]:starts[k+1]] are the indices of the points
+          in bucket k = group * num_cells + cell_id.
+        """
+        keys = self.cell_ids(points)
+        if groups is not None:
+            keys = keys + groups * self.num_cells
+        order = np.argsort(keys, kind='stable')
+        starts = np.searchsorted(keys[order], np.arange(num_groups * self.num_cells + 1))
+        return order, starts
+
+    def covering_cells(self, centers, radii):
+        """
+        Cells that overlap the bounding box of each ball.
+
+        Parameters:
+        - centers (np.ndarray): N x dims array of ball centers.
+        - radii (np.ndarray): Radius of each ball.
+
+        Returns:
+        - center_idx (np.ndarray): Index of the ball for each covering cell.
+        - cell_ids (np.ndarray): Flat id of each covering cell.
+        """
+        radii = np.asarray(radii, dtype=float)[:, np.newaxis]
+        lower = self.cell_coords(centers - radii)
+        extent = self.cell_coords(centers + radii) - lower + 1 # number of cells covered along each axis
+        # Offsets of the largest box, masked down to each ball's own box
+        offsets = np.stack(np.meshgrid(*[np.arange(e) for e in extent.max(axis=0)], indexing='ij'), axis=-1).reshape(-1, self.num_dimensions)
+        valid = np.all(offsets[np.newaxis, :, :] < extent[:, np.newaxis, :], axis=-1)
+        center_idx, offset_idx = np.nonzero(valid)
+        cell_ids = (lower[center_idx] + offsets[offset_idx]) @ self._strides
+        return center_idx, cell_ids
+
+    def gather(self, bucket_keys, cell_list):
+        """
+        Expand bucket keys into the points they contain.
+
+        Parameters:
+        - bucket_keys (np.ndarray): Bucket (group * num_cells + cell_id) of each query.
+        - cell_list (tuple): (order, starts) from cell_list.
+
+        Returns:
+        - query_idx (np.ndarray): Index into bucket_keys for each point found.
+        - point_idx (np.ndarray): Index of each point found.
+        """
+        order, starts = cell_list
+        counts = starts[bucket_keys + 1] - starts[bucket_keys]
+        query_idx = np.repeat(np.arange(len(bucket_keys)), counts)
+        # Position of each found point within the sorted order
+        first = np.repeat(starts[bucket_keys] - np.cumsum(counts) + counts, counts)
+        return query_idx, order[first + np.arange(len(query_idx))]
+
+    def query_pairs(self, centers, radii, cell_list, groups=None):
+        """
+        Candidate (center, point) pairs whose cells overlap each ball. Candidates still need an exact distance check.
+
+        Parameters:
+        - centers (np.ndarray): N x dims array of ball centers.
+        - radii (np.ndarray): Radius of each ball.
+        - cell_list (tuple): (order, starts) of the points to search.
+        - groups (np.ndarray): Optional group of each center, only points in the same group are returned.
+
+        Returns:
+        - center_idx (np.ndarray): Index of the center of each pair, sorted by center then point.
+        - point_idx (np.ndarray): Index of the point of each pair.
+        """
+        center_idx, cell_ids = self.covering_cells(centers, radii)
+        bucket_keys = cell_ids if groups is None else cell_ids + groups[center_idx] * self.num_cells
+        query_idx, point_idx = self.gather(bucket_keys, cell_list)
+        center_idx = center_idx[query_idx]
+        # Same pair order as a dense scan, so accumulated sums match it exactly
+        pair_order = np.lexsort((point_idx, center_idx))
+        return center_idx[pair_order], point_idx[pair_order]
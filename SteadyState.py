@@ -0,0 +1,93 @@
+import Ranking
+
+def dominates(fitness1, fitness2):
+    """Whether fitness1 Pareto-dominates fitness2, both minimised (Pygmo convention)."""
+    return all(f1 <= f2 for f1, f2 in zip(fitness1, fitness2)) and any(f1 < f2 for f1, f2 in zip(fitness1, fitness2))
+
+class ParetoFronts:
+    def __init__(self):
+        """
+        Non-dominated fronts of a population that changes one individual at a time, for steady-state evolution.
+        Inserting an individual only re-ranks the individuals it pushes down a front, instead of sorting the whole
+        population again. fronts[0] is the non-dominated front, fronts[k] is dominated only by fronts 0..k-1.
+        """
+        self.fronts = []
+
+    def __len__(self):
+        return sum(len(front) for front in self.fronts)
+
+    def _front_dominates(self, front, ind):
+        return any(dominates(member.fitness, ind.fitness) for member in front)
+
+    def insert(self, ind):
+        """
+        Insert an evaluated individual, moving the individuals it dominates down the fronts.
+
+        Parameters:
+        - ind (Individual): Individual with its (minimised) fitness set.
+
+        Returns:
+        - rank (int): Index of the front the individual was inserted in.
+        """
+        # The fronts dominating the individual come first, so binary search for the first one that does not
+        lo, hi = 0, len(self.fronts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._front_dominates(self.fronts[mid], ind):
+                lo = mid + 1
+            else:
+                hi = mid
+        rank = lo
+        if rank == len(self.fronts):
+            self.fronts.append([ind])
+            return rank
+
+        # Members of its front that it dominates move down one front, and so on for the members those dominate
+        front = self.fronts[rank]
+        demoted = [member for member in front if dominates(ind.fitness, member.fitness)]
+        self.fronts[rank] = [member for member in front if not dominates(ind.fitness, member.fitness)] + [ind]
+        for k in range(rank + 1, len(self.fronts) + 1):
+            if not demoted:
+                break
+            if k == len(self.fronts):
+                self.fronts.append(demoted)
+                break
+            front = self.fronts[k]
+            dominated = [self._front_dominates(demoted, member) for member in front]
+            self.fronts[k] = [member for member, d in zip(front, dominated) if not d] + demoted
+            demoted = [member for member, d in zip(front, dominated) if d]
+        return rank
+
+    def _front_order(self, front):
+        """Positions in a front from best to worst, with the crowding distance ordering of Ranking.sort_population."""
+        if len(front) < 3:
+            return list(range(len(front))) # Boundary points of the front
+        points = [ind.fitness for ind in front]
+        # NOTE: NaN distances (an objective equal across the front) come first, as in Ranking.sort_population
+        return Ranking.sort_population(points, ranks=[0] * len(front), distances=Ranking.crowding_distance(points)).tolist()
+
+    def remove_worst(self):
+        """
+        Remove the individual NSGA-II would discard first: the last one of the last front in crowding distance order.
+        Nothing else changes rank, as no individual is dominated by the last front only.
+
+        Returns:
+        - ind (Individual): The removed individual.
+        """
+        front = self.fronts[-1]
+        ind = front.pop(self._front_order(front)[-1])
+        if not front:
+            self.fronts.pop()
+        return ind
+
+    def sorted_individuals(self):
+        """
+        Individuals from best to worst: by front, then by crowding distance within a front as Ranking.sort_population.
+
+        Returns:
+        - sorted_inds (list): Every individual, in the order Ranking.sort_population would rank them.
+        """
+        sorted_inds = []
+        for front in self.fronts:
+            sorted_inds.extend(front[i] for i in self._front_order(front))
+        return sorted_inds
@@ -1,5 +1,4 @@
 # Import necessary modules
-import copy
 import torch
 import yaml
 
@@ -9,6 +8,23 @@ from Individual import Individual
 class Utils:
     def __init__(self, num_objs=2):
         self.num_objs = num_objs
+        # Policies of discarded individuals, reused as parameter buffers for offspring instead of deep copies
+        self.policy_pool = []
+
+    def recycle(self, policies):
+        """
+        Hand back policies that are no longer part of the population, so that their parameters can hold offspring.
+
+        Parameters:
+        - policies (list): Policy instances nothing else refers to any more.
+        """
+        self.policy_pool.extend(policies)
+
+    def offspring_buffer(self, parent: Policy):
+        """Policy shaped like the parent whose parameters are about to be overwritten. Recycled if possible, allocated uninitialised otherwise."""
+        if self.policy_pool:
+            return self.policy_pool.pop()
+        return Policy(parent.config_filename, input_size=parent.input_size, output_size=parent.output_size, init_parameters=False)
 
     def SBX(self, x1: Policy, x2: Policy, eta=15):
         """
@@ -23,9 +39,9 @@ class Utils:
         - y1 (Policy): First offspring Policy instance.
         - y2 (Policy): Second offspring Policy instance.
         """
-        # Create deep copies of the parent policies to serve as offspring
-        y1 = copy.deepcopy(x1)
-        y2 = copy.deepcopy(x2)
+        # Parameter buffers for the offspring, every parameter is written below
+        y1 = self.offspring_buffer(x1)
+        y2 = self.offspring_buffer(x2)
 
         with torch.no_grad():
             # Iterate over parameters (weights and biases) of the policies
@@ -55,6 +71,55 @@ class Utils:
 
         return y1, y2
 
+    def SBX_batch(self, p1: torch.Tensor, p2: torch.Tensor, eta=15, generator=None):
+        """
+        Perform Simulated Binary Crossover (SBX) on many parent pairs at once, given as flattened parameter vectors.
+
+        Parameters:
+        - p1 (torch.Tensor): num_pairs x num_params parameters of the first parent of each pair.
+        - p2 (torch.Tensor): num_pairs x num_params parameters of the second parent of each pair.
+        - eta (int, optional): Distribution index controlling the spread of offspring. Default is 15.
+        - generator (torch.Generator, optional): Source of the random numbers. Default is the global generator.
+
+        Returns:
+        - child1 (torch.Tensor): num_pairs x num_params parameters of the first offspring of each pair.
+        - child2 (torch.Tensor): num_pairs x num_params parameters of the second offspring of each pair.
+        """
+        # Generate random numbers u between 0 and 1
+        u = torch.rand(p1.shape, generator=generator)
+
+        # Compute beta_q using the SBX formula
+        beta_q = torch.where(
+            u <= 0.5,
+            (2 * u) ** (1.0 / (eta + 1)),
+            (1 / (2 * (1 - u))) ** (1.0 / (eta + 1)),
+        )
+
+        # Generate offspring parameters
+        child1 = 0.5 * ((1 + beta_q) * p1 + (1 - beta_q) * p2)
+        child2 = 0.5 * ((1 - beta_q) * p1 + (1 + beta_q) * p2)
+        return child1, child2
+
+    def mutate_batch(self, params: torch.Tensor, mutation_rate, mutation_scale, generator=None):
+        """
+        Mutate many flattened parameter vectors at once, with the same operator as Policy.mutate.
+
+        Parameters:
+        - params (torch.Tensor): num_policies x num_params parameters.
+        - mutation_rate (float): Probability of mutating each parameter.
+        - mutation_scale (float): Maximum change for mutations.
+        - generator (torch.Generator, optional): Source of the random numbers. Default is the global generator.
+
+        Returns:
+        - torch.Tensor: The mutated parameters.
+        """
+        # Generate a mask for which parameters to mutate
+        mutation_mask = torch.rand(params.shape, generator=generator) < mutation_rate
+        # Generate random mutations
+        mutations = torch.empty_like(params).uniform_(-mutation_scale, mutation_scale, generator=generator)
+        # Apply mutations
+        return params + mutation_mask * mutations
+
     def crossover(self, parent1: Individual, parent2: Individual, glob_id_counter: int):
         """
         Perform a crossover between 2 Individuals.
@@ -63,6 +128,20 @@ class Utils:
         - parent1 (Individual): First parent Individual instance.
         - parent2 (Individual): Second parent Individual instance.
 
+        Returns:
+        - offspring1 (Individual): First offspring Individual instance.
+        - offspring2 (Individual): Second offspring Individual instance.
+        """
+        return self.crossover_joint_policies(parent1.joint_policy, parent2.joint_policy, glob_id_counter)
+
+    def crossover_joint_policies(self, parent_jp1: list, parent_jp2: list, glob_id_counter: int):
+        """
+        Perform a crossover between 2 joint policies, e.g. compound ones assembled from several Individuals.
+
+        Parameters:
+        - parent_jp1 (list): First parent joint policy, one Policy per agent.
+        - parent_jp2 (list): Second parent joint policy, one Policy per agent.
+
         Returns:
         - offspring1 (Individual): First offspring Individual instance.
         - offspring2 (Individual): Second offspring Individual instance.
@@ -71,11 +150,11 @@ class Utils:
         joint_policy1 = []
         joint_policy2 = []
 
-        if len(parent1.joint_policy) != len(parent2.joint_policy):
+        if len(parent_jp1) != len(parent_jp2):
             raise ValueError("Parents must have joint policies of equal length for crossover!")
         
         # Iterate through both parents' policies and perform SBX
-        for p1, p2 in zip(parent1.joint_policy, parent2.joint_policy):
+        for p1, p2 in zip(parent_jp1, parent_jp2):
             o1, o2 = self.SBX(p1, p2) # Get two offspring policies
             joint_policy1.append(o1)
             joint_policy2.append(o2)
@@ -9,9 +9,10 @@ import NSGAII
 import KParentNSGAII
 import DMO
 import NSGAII_D
+import IslandModel
 
 if __name__ == '__main__':
-    assert len(sys.argv) == 9, "Correct usage: python alg_name domain_name data_dirpath alg_config env_config seed label traj_write_freq"
+    assert len(sys.argv) in (9, 10), "Correct usage: python alg_name domain_name data_dirpath alg_config env_config seed label traj_write_freq [num_workers]"
    
     # Process the command line args
     alg_name = sys.argv[1]
@@ -26,6 +27,11 @@ if __name__ == '__main__':
     seed_val_str = str(seed_val)
     label = sys.argv[7]
     traj_write_freq = int(sys.argv[8])
+    # Optional number of rollout worker processes, overriding the alg config. 1 runs the rollouts in this process
+    evaluator, num_workers = None, None
+    if len(sys.argv) == 10:
+        num_workers = int(sys.argv[9])
+        evaluator = 'serial' if num_workers == 1 else 'process_pool'
 
     # Datetime for file naming
     datetime_now_string = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -38,6 +44,22 @@ if __name__ == '__main__':
     dest_env_config_filename = data_dir+alg_name+'_'+domain_name+'_'+seed_val_str+'_'+label+'_'+datetime_now_string+'_envconfig.yaml'
     shutil.copyfile(src_env_config_filename, dest_env_config_filename)
 
+    # Island mode: one population per process, with migration between them
+    island_settings = IslandModel.load_island_config(dest_alg_config_filename)
+    if island_settings['num_islands'] > 1:
+        data_filenames = [data_dir+alg_name+'_'+domain_name+'_'+seed_val_str+'_'+label+'_'+datetime_now_string+'_island'+str(island)+'_savedata.csv'
+                          for island in range(island_settings['num_islands'])]
+        IslandModel.run_islands(alg_name=alg_name,
+                                domain_name=domain_name,
+                                alg_config_filename=dest_alg_config_filename,
+                                env_config_filename=dest_env_config_filename,
+                                data_filenames=data_filenames,
+                                seed=seed_val,
+                                traj_write_freq=traj_write_freq,
+                                evaluator=evaluator,
+                                num_workers=num_workers)
+        sys.exit(0)
+
     # Set the seed value for all libraries
     random.seed(seed_val)
     torch.manual_seed(seed_val)
@@ -48,23 +70,36 @@ if __name__ == '__main__':
         alg = NSGAII.NSGAII(alg_config_filename=dest_alg_config_filename,
                             domain_name=domain_name,
                             data_filename=data_filename,
-                            rover_config_filename=dest_env_config_filename)
+                            rover_config_filename=dest_env_config_filename,
+                            evaluator=evaluator,
+                            num_workers=num_workers)
     elif alg_name == 'kpnsga2':
         alg = KParentNSGAII.KParentNSGAII(alg_config_filename=dest_alg_config_filename,
                                           domain_name=domain_name,
                                           data_filename=data_filename,
-                                          rover_config_filename=dest_env_config_filename)
+                                          rover_config_filename=dest_env_config_filename,
+                                          evaluator=evaluator,
+                                          num_workers=num_workers)
     elif alg_name == 'dmo':
         alg = DMO.DMO(alg_config_filename=dest_alg_config_filename,
                       domain_name=domain_name,
                       data_filename=data_filename,
-                      rover_config_filename=dest_env_config_filename)
+                      rover_config_filename=dest_env_config_filename,
+                      evaluator=evaluator,
+                      num_workers=num_workers)
     elif alg_name == 'nsga2+d':
         alg = NSGAII_D.NSGAII_D(alg_config_filename=dest_alg_config_filename,
                                 domain_name=domain_name,
                                 data_filename=data_filename,
-                                rover_config_filename=dest_env_config_filename)
+                                rover_config_filename=dest_env_config_filename,
+                                evaluator=evaluator,
+                                num_workers=num_workers)
     
     # Run the algorithm
-    for gen in range(alg.num_gens):
-        alg.evolve(gen=gen, traj_write_freq=traj_write_freq)
\ No newline at end of file
+    if getattr(alg, 'steady_state', False):
+        # Same evaluation budget as the generational run
+        alg.evolve_steady_state(num_evals=alg.num_gens * alg.pop_size, traj_write_freq=traj_write_freq)
+    else:
+        for gen in range(alg.num_gens):
+            alg.evolve(gen=gen, traj_write_freq=traj_write_freq)
+    alg.close()
\ No newline at end of file